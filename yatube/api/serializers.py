@@ -0,0 +1,49 @@
+"""
+Компактная сериализация постов и комментариев в словари.
+Клиент может запросить только нужные поля параметром fields.
+"""
+POST_FIELDS = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date.isoformat(),
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': lambda post: post.image.url if post.image else None,
+    'comments_count': lambda post: post.comments_count,
+}
+
+COMMENT_FIELDS = {
+    'id': lambda comment: comment.pk,
+    'author': lambda comment: comment.author.username,
+    'text': lambda comment: comment.text,
+    'created': lambda comment: comment.created.isoformat(),
+}
+
+# Поля, которым нужны связанные объекты.
+POST_RELATED = {'author': 'author', 'group': 'group'}
+
+
+def parse_fields(value, available):
+    """
+    Список полей из строки «id,text».
+    Пустая строка — все поля; неизвестное поле — ValueError.
+    """
+    if not value:
+        return list(available)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ValueError(', '.join(unknown))
+    return fields
+
+
+def serialize(obj, fields, available):
+    return {field: available[field](obj) for field in fields}
+
+
+def serialize_post(post, fields):
+    return serialize(post, fields, POST_FIELDS)
+
+
+def serialize_comment(comment, fields=tuple(COMMENT_FIELDS)):
+    return serialize(comment, fields, COMMENT_FIELDS)
@@ -0,0 +1,181 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+TEMP_CACHE_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+# ETag лент выдаётся только при кэше, общем для процессов.
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': TEMP_CACHE_ROOT,
+}})
+class ApiViewsTests(TestCase):
+    POSTS_NUMBER = 25
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        for count in range(cls.POSTS_NUMBER):
+            cls.post = Post.objects.create(
+                text=f'Тестовый пост {count}',
+                author=cls.author,
+                group=cls.group,
+            )
+        Comment.objects.create(
+            text='Тестовый коммент', post=cls.post, author=cls.reader
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_lists(self):
+        """Ленты отдают посты от новых к старым."""
+        urls = {
+            'api:index': (self.client, {}),
+            'api:group_posts': (self.client, {'slug': self.group.slug}),
+            'api:profile_posts': (
+                self.client, {'username': self.author.username}
+            ),
+            'api:follow_index': (self.reader_client, {}),
+        }
+        for name, (client, kwargs) in urls.items():
+            with self.subTest(name=name):
+                response = client.get(reverse(name, kwargs=kwargs))
+                self.assertEqual(response.status_code, 200)
+                data = response.json()
+                self.assertEqual(data['results'][0]['id'], self.post.pk)
+                self.assertEqual(data['results'][0]['author'], 'auth')
+                self.assertIn('ETag', response)
+                self.assertIn('Last-Modified', response)
+
+    def test_missing_objects(self):
+        for url in (
+            reverse('api:group_posts', kwargs={'slug': 'missing'}),
+            reverse('api:profile_posts', kwargs={'username': 'missing'}),
+            reverse('api:post_detail', kwargs={'post_id': 0}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_follow_requires_login(self):
+        response = self.client.get(reverse('api:follow_index'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_field_selection(self):
+        response = self.client.get(
+            reverse('api:index'), {'fields': 'id,text'}
+        )
+        self.assertEqual(
+            set(response.json()['results'][0]), {'id', 'text'}
+        )
+        response = self.client.get(reverse('api:index'), {'fields': 'bad'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_pagination(self):
+        """Курсор проходит всю ленту без повторов."""
+        seen = []
+        params = {'limit': 10, 'fields': 'id'}
+        while True:
+            data = self.client.get(reverse('api:index'), params).json()
+            seen.extend(post['id'] for post in data['results'])
+            if not data['next']:
+                break
+            params['cursor'] = data['next']
+        self.assertEqual(len(seen), self.POSTS_NUMBER)
+        self.assertEqual(len(set(seen)), self.POSTS_NUMBER)
+
+    def test_not_modified_skips_feed_query(self):
+        """Повторный запрос с ETag получает 304 одним запросом к базе."""
+        url = reverse('api:index')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since(self):
+        url = reverse('api:index')
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_post_changes_etag(self):
+        url = reverse('api:index')
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_changed_post_changes_etag(self):
+        """Комментарий и правка текста меняют ETag лент с постом."""
+        def comment():
+            Comment.objects.create(
+                text='Ещё коммент', post=self.post, author=self.reader
+            )
+
+        def edit():
+            post = Post.objects.get(pk=self.post.pk)
+            post.text = 'Исправленный текст'
+            post.save()
+
+        for name, change in (('comment', comment), ('edit', edit)):
+            for url in (
+                reverse('api:index'),
+                reverse('api:group_posts', kwargs={'slug': self.group.slug}),
+                reverse(
+                    'api:profile_posts',
+                    kwargs={'username': self.author.username}
+                ),
+            ):
+                with self.subTest(name=name, url=url):
+                    etag = self.client.get(url)['ETag']
+                    change()
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 200)
+
+    def test_follow_etag_changes_with_follows(self):
+        """ETag ленты подписок зависит от подписок пользователя."""
+        url = reverse('api:follow_index')
+        etag = self.reader_client.get(url)['ETag']
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=other)
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_post_detail(self):
+        url = reverse('api:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url)
+        data = response.json()
+        self.assertEqual(data['text'], self.post.text)
+        self.assertEqual(data['group'], self.group.slug)
+        self.assertEqual(data['comments'][0]['author'], 'reader')
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Comment.objects.create(
+            text='Ещё коммент', post=self.post, author=self.reader
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,15 @@
+from django.urls import path
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.index, name='index'),
+    path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('groups/<slug:slug>/posts/', views.group_posts, name='group_posts'),
+    path(
+        'profiles/<str:username>/posts/',
+        views.profile_posts, name='profile_posts'
+    ),
+    path('follow/', views.follow_index, name='follow_index'),
+]
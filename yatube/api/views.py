@@ -0,0 +1,181 @@
+import hashlib
+from functools import wraps
+
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+from django.views.decorators.vary import vary_on_cookie
+
+from core.conditional import get_versions, versions_shared
+from posts.feed import feed_posts
+from posts.models import Group, Post
+from posts.utils import KeysetPaginator, comments_page
+from posts.views import (
+    QUANTITY_OF_COMMENTS_ON_PAGE, follow_keys, group_keys, index_keys,
+    profile_keys
+)
+
+from .serializers import (
+    POST_FIELDS, POST_RELATED, parse_fields, serialize_comment,
+    serialize_post
+)
+
+User = get_user_model()
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def api_response(data, status=200):
+    """JSON без пробелов и без экранирования кириллицы."""
+    return JsonResponse(
+        data, status=status,
+        json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False}
+    )
+
+
+def api_error(message, status):
+    return api_response({'detail': message}, status=status)
+
+
+def api_login_required(view):
+    """Как login_required, но отвечает 401 вместо перенаправления."""
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return api_error('Требуется авторизация.', 401)
+        return view(request, *args, **kwargs)
+    return inner
+
+
+def make_etag(*parts):
+    raw = '|'.join(str(part) for part in parts)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def feed_condition(source, keys_func, *extra):
+    """
+    condition() для ленты. ETag собирается из тех же версий
+    содержимого, что и у HTML-страниц (core.conditional), поэтому
+    меняется и при правке текста, и при новом комментарии.
+    Last-Modified — дата самого свежего поста ленты.
+    extra — функции (request, **kwargs), добавляющие части ETag.
+    """
+    def etag(request, **kwargs):
+        # Версии из кэша отдельного процесса у воркеров расходятся.
+        if not versions_shared():
+            return None
+        return make_etag(
+            request.get_full_path(),
+            *(part(request, **kwargs) for part in extra),
+            *get_versions(keys_func(request, **kwargs))
+        )
+
+    def last_modified(request, **kwargs):
+        # Источники уже упорядочены от новых постов к старым.
+        return source(request, **kwargs).values_list(
+            'pub_date', flat=True
+        ).first()
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def post_list(request, posts):
+    """Страница постов с выбором полей и курсорной пагинацией."""
+    try:
+        fields = parse_fields(request.GET.get('fields'), POST_FIELDS)
+    except ValueError as error:
+        return api_error('Неизвестные поля: {}.'.format(error), 400)
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        return api_error('limit должен быть числом.', 400)
+    limit = max(1, min(limit, MAX_LIMIT))
+    related = [POST_RELATED[field] for field in fields
+               if field in POST_RELATED]
+    if related:
+        posts = posts.select_related(*related)
+    page = KeysetPaginator(posts, limit).get_page(request.GET.get('cursor'))
+    return api_response({
+        'results': [serialize_post(post, fields) for post in page],
+        'next': page.next_cursor(),
+        'previous': page.previous_cursor(),
+    })
+
+
+def index_source(request):
+    return Post.objects.all()
+
+
+def group_source(request, slug):
+    return Post.objects.filter(group__slug=slug)
+
+
+def profile_source(request, username):
+    return Post.objects.filter(author__username=username)
+
+
+def follow_source(request):
+    return feed_posts(request.user)
+
+
+@require_GET
+@feed_condition(index_source, index_keys)
+def index(request):
+    return post_list(request, index_source(request))
+
+
+@require_GET
+@feed_condition(group_source, group_keys)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return post_list(request, group.posts.all())
+
+
+@require_GET
+@feed_condition(profile_source, profile_keys)
+def profile_posts(request, username):
+    author = get_object_or_404(User, username=username)
+    return post_list(request, author.posts.all())
+
+
+@require_GET
+@api_login_required
+@vary_on_cookie
+@cache_control(private=True)
+@feed_condition(follow_source, follow_keys, lambda request: request.user.pk)
+def follow_index(request):
+    return post_list(request, follow_source(request))
+
+
+def post_etag(request, post_id):
+    """ETag поста по его изменяемым полям и числу комментариев."""
+    row = Post.objects.filter(pk=post_id).values_list(
+        'text', 'group_id', 'image', 'comments_count'
+    ).first()
+    if row is None:
+        return None
+    return make_etag(post_id, request.get_full_path(), *row)
+
+
+@require_GET
+@condition(etag_func=post_etag)
+def post_detail(request, post_id):
+    try:
+        fields = parse_fields(request.GET.get('fields'), POST_FIELDS)
+    except ValueError as error:
+        return api_error('Неизвестные поля: {}.'.format(error), 400)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
+    comments, comments_next = comments_page(
+        post.comments.select_related('author'),
+        request.GET.get('cursor'),
+        QUANTITY_OF_COMMENTS_ON_PAGE
+    )
+    data = serialize_post(post, fields)
+    data['comments'] = [serialize_comment(comment) for comment in comments]
+    data['comments_next'] = comments_next
+    return api_response(data)
@@ -0,0 +1,187 @@
+"""
+ASGI-приложение поверх WSGI-обработчика Django.
+
+Django 2.2 не умеет асинхронные view, поэтому каждый запрос целиком
+(view, отрисовка ответа, закрытие соединений с базой) выполняется
+в ограниченном пуле потоков, а цикл событий лишь принимает запросы
+и отдаёт ответы. Медленное чтение из базы занимает поток пула,
+но не сервер целиком.
+"""
+import asyncio
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+# Сколько готовых кусков ответа может ждать отправки клиенту.
+QUEUE_SIZE = 8
+_END = object()
+
+
+def build_environ(scope, body):
+    """WSGI environ по HTTP-scope ASGI."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'SERVER_PROTOCOL': 'HTTP/{}'.format(
+            scope.get('http_version', '1.1')
+        ),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            key = name
+        else:
+            key = 'HTTP_' + name
+        if key in environ:
+            value = environ[key] + ',' + value
+        environ[key] = value
+    return environ
+
+
+class AsgiHandler:
+    """
+    Выполняет WSGI-приложение в пуле из max_workers потоков.
+    Куски ответа передаются клиенту по мере готовности,
+    поэтому потоковые ответы не собираются в память целиком.
+    """
+
+    def __init__(self, wsgi_application, max_workers=None):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.ASGI_THREADS,
+            thread_name_prefix='asgi',
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError(
+                'Неподдерживаемый тип соединения: {}'.format(scope['type'])
+            )
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        """Тело запроса; большое уходит во временный файл."""
+        body = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body', False):
+                body.seek(0)
+                return body
+
+    async def http(self, scope, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(QUEUE_SIZE)
+        worker = loop.run_in_executor(
+            self.executor, self.run_wsgi,
+            build_environ(scope, body), loop, queue
+        )
+        finished = False
+        try:
+            started = await queue.get()
+            if started is _END:
+                finished = True
+                # Приложение упало до ответа: пробрасываем его ошибку.
+                await worker
+            status, headers = started
+            await send({
+                'type': 'http.response.start',
+                'status': status,
+                'headers': headers,
+            })
+            while True:
+                chunk = await queue.get()
+                if chunk is _END:
+                    finished = True
+                    break
+                await send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                })
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            # Если клиент отключился, поток пула ещё ждёт места
+            # в очереди: вычитываем её до конца ответа.
+            while not finished:
+                finished = await queue.get() is _END
+            await worker
+            body.close()
+
+    def run_wsgi(self, environ, loop, queue):
+        """
+        Выполняется в потоке пула: вызывает приложение, перебирает
+        ответ и закрывает его в том же потоке, что и view,
+        чтобы сигнал request_finished закрыл нужное соединение с базой.
+        """
+        def put(item):
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started.append((
+                int(status.split(' ', 1)[0]),
+                [(name.lower().encode('latin-1'),
+                  value.strip().encode('latin-1'))
+                 for name, value in headers],
+            ))
+
+        try:
+            response = self.wsgi_application(environ, start_response)
+        except BaseException:
+            put(_END)
+            raise
+        try:
+            iterator = iter(response)
+            # Заголовки можно отправить, только когда приложение
+            # вызвало start_response: до первого куска или после него.
+            first = next(iterator, None)
+            put(started[0])
+            if first:
+                put(first)
+            for chunk in iterator:
+                if chunk:
+                    put(chunk)
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+            put(_END)
@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import note_cache_event
+
+HIT = 'hit'
+MISS = 'miss'
+STALE = 'stale'
+REBUILD = 'rebuild'
+
+_stats = defaultdict(Counter)
+_stats_lock = threading.Lock()
+
+
+def record(prefix, event):
+    with _stats_lock:
+        _stats[prefix][event] += 1
+    note_cache_event(event)
+
+
+def stats():
+    """Счётчики попаданий, промахов и пересборок по префиксам ключей."""
+    with _stats_lock:
+        return {prefix: dict(events) for prefix, events in _stats.items()}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class Uncached:
+    """Результат builder, который отдаётся, но не кладётся в кэш."""
+    def __init__(self, value):
+        self.value = value
+
+
+def get_or_rebuild(key, builder, timeout, prefix=None, alias='default'):
+    """
+    Возвращает значение из кэша, при необходимости пересобирая его.
+
+    Значение хранится дольше timeout на CACHE_STALE_GRACE секунд.
+    Когда свежесть истекла, пересобирает его только тот процесс,
+    который первым захватил блокировку через cache.add, а остальные
+    до окончания пересборки отдают устаревшее значение.
+    Если builder вернул Uncached, значение в кэш не попадает.
+    """
+    cache = caches[alias]
+    prefix = prefix or key.split(':', 1)[0]
+    lock_key = key + ':rebuild'
+    entry = cache.get(key)
+    now = time.time()
+    locked = False
+    if entry is not None:
+        value, fresh_until = entry
+        if fresh_until is None or fresh_until > now:
+            record(prefix, HIT)
+            return value
+        if not cache.add(lock_key, 1, settings.CACHE_REBUILD_LOCK_TIMEOUT):
+            record(prefix, STALE)
+            return value
+        locked = True
+    else:
+        record(prefix, MISS)
+    try:
+        value = builder()
+        record(prefix, REBUILD)
+        if isinstance(value, Uncached):
+            return value.value
+        if timeout is None:
+            cache.set(key, (value, None), None)
+        else:
+            cache.set(
+                key,
+                (value, now + timeout),
+                timeout + settings.CACHE_STALE_GRACE
+            )
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return value
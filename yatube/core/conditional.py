@@ -0,0 +1,131 @@
+"""
+Условные ответы для HTML-страниц.
+
+Содержимое страниц описывается версиями в кэше: сигналы меняют
+версию при изменении данных, а ETag страницы собирается из версий,
+адреса и зрителя без единого запроса к базе.
+
+Версии должны быть видны всем воркерам, поэтому с кэшем отдельного
+процесса (locmem) условные ответы выключены: иначе воркер, который
+не обрабатывал изменение, отвечал бы 304 на устаревшую страницу.
+Страница, прочитанная с реплики, не получает ETag, пока версия
+моложе REPLICA_PIN_SECONDS: реплика ещё может не видеть изменения.
+"""
+import hashlib
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from . import routers
+
+VERSION_PREFIX = 'content_version:'
+
+
+def versions_shared():
+    """Хранит ли кэш default версии, общие для всех процессов."""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def new_version():
+    """Случайная версия с временем изменения: «<hex>:<timestamp>»."""
+    return '{}:{}'.format(uuid.uuid4().hex, time.time())
+
+
+def bump_version(*keys):
+    """Отмечает, что содержимое с этими ключами изменилось."""
+    cache.set_many({VERSION_PREFIX + key: new_version() for key in keys}, None)
+
+
+def get_versions(keys):
+    """Версии ключей; отсутствующие в кэше создаются заново."""
+    names = [VERSION_PREFIX + key for key in keys]
+    versions = cache.get_many(names)
+    for name in names:
+        if name not in versions:
+            cache.add(name, new_version(), None)
+            versions[name] = cache.get(name)
+    return [versions[name] for name in names]
+
+
+def versions_settled(versions, seconds):
+    """Все версии старше seconds: реплики уже получили изменения."""
+    limit = time.time() - seconds
+    return all(
+        float(version.partition(':')[2] or 0) <= limit
+        for version in versions
+    )
+
+
+def page_etag(request, keys):
+    """
+    ETag из версий, адреса и зрителя. Для авторизованных в него
+    входит и CSRF-cookie: после её смены (например, при входе)
+    форма со старым токеном из 304 уже не отправится.
+    """
+    if request.user.is_authenticated:
+        viewer = '{}:{}'.format(
+            request.user.pk,
+            request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+        )
+    else:
+        viewer = 'anon'
+    request.content_versions = get_versions(keys)
+    raw = '|'.join(
+        [settings.CONTENT_RELEASE, request.get_full_path(), viewer]
+        + request.content_versions
+    )
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def conditional_page(keys_func):
+    """
+    Отвечает 304, если ETag страницы совпал с If-None-Match,
+    не вызывая саму view.
+
+    keys_func(request, **kwargs) возвращает ключи версий,
+    от которых зависит страница. Анонимным ответам разрешено
+    публичное кэширование, авторизованным — только в браузере
+    и с обязательной проверкой. Без общего кэша ETag не выдаётся,
+    как и страницам с реплики, пока версия моложе REPLICA_PIN_SECONDS.
+    """
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=lambda request, *args, **kwargs: page_etag(
+                request, keys_func(request, **kwargs)
+            )
+        )(view)
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if versions_shared():
+                response = conditional_view(request, *args, **kwargs)
+            else:
+                response = view(request, *args, **kwargs)
+            # Реплика могла ещё не получить недавнее изменение:
+            # такой странице нельзя выдавать ETag текущей версии.
+            lagging = routers.replica_used() and not versions_settled(
+                getattr(request, 'content_versions', []),
+                settings.REPLICA_PIN_SECONDS
+            )
+            if lagging and response.has_header('ETag'):
+                del response['ETag']
+            if request.method not in ('GET', 'HEAD'):
+                return response
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(
+                    response, public=True,
+                    max_age=settings.HTML_CACHE_MAX_AGE
+                )
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return inner
+    return decorator
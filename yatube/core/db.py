@@ -0,0 +1,63 @@
+"""
+Настройка соединений с SQLite: прагмы при подключении
+и повтор запросов, упавших на блокировке базы.
+"""
+import sqlite3
+import time
+
+from django.conf import settings
+from django.db import OperationalError
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+LOCKED = 'database is locked'
+
+
+def apply_pragmas(connection):
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(
+            'PRAGMA {} = {}'.format(name, value)
+        ).fetchall()
+
+
+def retry_on_lock(execute, sql, params, many, context):
+    """
+    Повторяет запрос с растущей паузой, пока база заблокирована.
+    Внутри транзакции не повторяет: SQLite может потребовать
+    её откатить, и решать это должен вызывающий код.
+    """
+    connection = context['connection']
+    retries = settings.SQLITE_LOCK_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            return execute(sql, params, many, context)
+        except OperationalError as error:
+            if (LOCKED not in str(error) or connection.in_atomic_block
+                    or attempt == retries):
+                raise
+            time.sleep(settings.SQLITE_LOCK_BACKOFF * 2 ** attempt)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    apply_pragmas(connection)
+    if retry_on_lock not in connection.execute_wrappers:
+        # В начало списка: connection.execute_wrapper() снимает
+        # последнюю обёртку, и наша не должна ей оказаться.
+        connection.execute_wrappers.insert(0, retry_on_lock)
+
+
+def copy_database(source, target_path):
+    """
+    Копирует открытую базу SQLite в файл target_path
+    через backup API: читатели реплики видят либо старую,
+    либо новую копию целиком.
+    """
+    source.ensure_connection()
+    target = sqlite3.connect(target_path)
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
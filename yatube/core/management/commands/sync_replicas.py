@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.db import copy_database
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу SQLite в файлы реплик.'
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError(
+                'Реплики не настроены: задайте YATUBE_REPLICAS.'
+            )
+        source = connections[DEFAULT_DB_ALIAS]
+        for alias in settings.DATABASE_REPLICAS:
+            # Закрываем соединение реплики, чтобы оно увидело новую копию.
+            connections[alias].close()
+            path = connections[alias].settings_dict['NAME']
+            copy_database(source, path)
+            self.stdout.write('{}: {}'.format(alias, path))
+        self.stdout.write(self.style.SUCCESS('Реплики обновлены'))
@@ -0,0 +1,206 @@
+import bisect
+import threading
+import time
+from collections import Counter
+
+from django.template.base import Template
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    'request_duration_seconds': DURATION_BUCKETS,
+    'sql_queries': COUNT_BUCKETS,
+    'sql_duration_seconds': DURATION_BUCKETS,
+    'template_render_seconds': DURATION_BUCKETS,
+    'response_size_bytes': SIZE_BUCKETS,
+}
+
+# Ключ as_dict() со счётчиками кэша по префиксам ключей.
+CACHE_PREFIXES = 'cache_prefixes'
+
+_local = threading.local()
+
+
+def cache_prefix_stats():
+    # core.cache сам сообщает события в метрики запроса,
+    # поэтому импортируется здесь, а не в начале модуля.
+    from .cache import stats
+    return stats()
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин, как в Prometheus."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Пары (граница, число наблюдений не больше неё)."""
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            yield bound, total
+
+    def as_dict(self):
+        return {
+            'buckets': dict(self.cumulative()),
+            'sum': self.sum,
+            'count': self.count,
+        }
+
+
+class Registry:
+    """Метрики запросов процесса, сгруппированные по имени URL."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.cache_events = {}
+
+    def observe(self, view, values, cache_events):
+        with self.lock:
+            for name, value in values.items():
+                key = (name, view)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(HISTOGRAMS[name])
+                self.histograms[key].observe(value)
+            self.cache_events.setdefault(view, Counter()).update(
+                cache_events
+            )
+
+    def as_dict(self):
+        """Метрики по именам URL и события кэша по префиксам ключей."""
+        with self.lock:
+            result = {}
+            for (name, view), histogram in self.histograms.items():
+                result.setdefault(view, {})[name] = histogram.as_dict()
+            for view, events in self.cache_events.items():
+                result.setdefault(view, {})['cache'] = dict(events)
+        result[CACHE_PREFIXES] = cache_prefix_stats()
+        return result
+
+    def as_prometheus(self):
+        """Метрики в текстовом формате Prometheus."""
+        lines = []
+        with self.lock:
+            for name in HISTOGRAMS:
+                metric = 'yatube_' + name
+                lines.append('# TYPE {} histogram'.format(metric))
+                for (hist_name, view), histogram in sorted(
+                    self.histograms.items()
+                ):
+                    if hist_name != name:
+                        continue
+                    for bound, total in histogram.cumulative():
+                        lines.append(
+                            '{}_bucket{{view="{}",le="{}"}} {}'.format(
+                                metric, view, bound, total
+                            )
+                        )
+                    lines.append('{}_sum{{view="{}"}} {}'.format(
+                        metric, view, histogram.sum
+                    ))
+                    lines.append('{}_count{{view="{}"}} {}'.format(
+                        metric, view, histogram.count
+                    ))
+            lines.append('# TYPE yatube_cache_events_total counter')
+            for view, events in sorted(self.cache_events.items()):
+                for event, total in sorted(events.items()):
+                    lines.append(
+                        'yatube_cache_events_total'
+                        '{{view="{}",event="{}"}} {}'.format(
+                            view, event, total
+                        )
+                    )
+        lines.append('# TYPE yatube_cache_prefix_events_total counter')
+        for prefix, events in sorted(cache_prefix_stats().items()):
+            for event, total in sorted(events.items()):
+                lines.append(
+                    'yatube_cache_prefix_events_total'
+                    '{{prefix="{}",event="{}"}} {}'.format(
+                        prefix, event, total
+                    )
+                )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    """Метрики одного запроса; активны в потоке, который его обслуживает."""
+
+    def __init__(self):
+        self.sql_queries = 0
+        self.sql_duration = 0
+        self.template_duration = 0
+        self.template_depth = 0
+        self.cache_events = Counter()
+
+    def __enter__(self):
+        _local.current = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _local.current = None
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_queries += 1
+            self.sql_duration += time.perf_counter() - start
+
+
+def current():
+    return getattr(_local, 'current', None)
+
+
+def note_cache_event(event):
+    """Учитывает событие кэша в метриках текущего запроса."""
+    metrics = current()
+    if metrics is not None:
+        metrics.cache_events[event] += 1
+
+
+def instrument_templates():
+    """
+    Оборачивает Template.render, чтобы считать время отрисовки.
+    Время вложенных шаблонов учитывается только во внешнем.
+    """
+    if getattr(Template.render, 'instrumented', False):
+        return
+    original_render = Template.render
+
+    def render(self, context):
+        metrics = current()
+        if metrics is None:
+            return original_render(self, context)
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return original_render(self, context)
+        finally:
+            metrics.template_depth -= 1
+            if metrics.template_depth == 0:
+                metrics.template_duration += time.perf_counter() - start
+
+    render.instrumented = True
+    Template.render = render
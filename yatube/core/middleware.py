@@ -0,0 +1,226 @@
+import logging
+import random
+import re
+import time
+import zlib
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+
+from . import profiling, routers
+from .metrics import RequestMetrics, instrument_templates, registry
+from .streaming import stream_within
+
+profile_logger = logging.getLogger('yatube.templates')
+
+accepts_gzip = re.compile(r'\bgzip\b')
+
+
+class MetricsMiddleware:
+    """
+    Собирает метрики запросов по имени URL: время ответа,
+    число и время SQL-запросов, время отрисовки шаблонов,
+    события кэша и размер ответа.
+
+    Замеряется доля запросов METRICS_SAMPLE_RATE; при нуле
+    middleware только передаёт запрос дальше.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        instrument_templates()
+
+    def __call__(self, request):
+        rate = settings.METRICS_SAMPLE_RATE
+        if not rate or random.random() >= rate:
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        start = time.perf_counter()
+        with self.measure(metrics):
+            response = self.get_response(request)
+        if response.streaming:
+            response.streaming_content = self.stream(
+                request, response.streaming_content, metrics, start
+            )
+        else:
+            self.observe(
+                request, metrics, time.perf_counter() - start,
+                len(response.content)
+            )
+        return response
+
+    @contextmanager
+    def measure(self, metrics):
+        with ExitStack() as stack:
+            stack.enter_context(metrics)
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(metrics.sql_wrapper)
+                )
+            yield
+
+    def stream(self, request, content, metrics, start):
+        """Учитывает запросы и шаблоны отложенных частей страницы."""
+        size = 0
+        try:
+            with self.measure(metrics):
+                for chunk in content:
+                    size += len(chunk)
+                    yield chunk
+        finally:
+            self.observe(request, metrics, time.perf_counter() - start, size)
+
+    def observe(self, request, metrics, duration, size):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        registry.observe(view, {
+            'request_duration_seconds': duration,
+            'sql_queries': metrics.sql_queries,
+            'sql_duration_seconds': metrics.sql_duration,
+            'template_render_seconds': metrics.template_duration,
+            'response_size_bytes': size,
+        }, metrics.cache_events)
+
+
+class TemplateProfilingMiddleware:
+    """
+    При TEMPLATE_PROFILING пишет в лог время каждого шаблона, include
+    и тега за запрос, а самые долгие записи отдаёт в Server-Timing.
+    """
+    def __init__(self, get_response):
+        if not settings.TEMPLATE_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        profiling.instrument()
+
+    def __call__(self, request):
+        profile = profiling.TemplateProfile()
+        with profile:
+            response = self.get_response(request)
+            # Ленивые ответы (TemplateResponse) отрисовываются здесь.
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+        if response.streaming:
+            # Заголовки уходят раньше отложенных частей, поэтому время
+            # потоковой страницы целиком попадает только в лог.
+            response.streaming_content = self.stream(
+                request, response.streaming_content, profile
+            )
+        elif profile.durations:
+            response['Server-Timing'] = profile.server_timing(
+                settings.TEMPLATE_PROFILING_TOP
+            )
+            self.log(request, profile)
+        return response
+
+    def stream(self, request, content, profile):
+        yield from stream_within(profile, content)
+        if profile.durations:
+            self.log(request, profile)
+
+    def log(self, request, profile):
+        profile_logger.info(
+            '%s\n%s', request.get_full_path(),
+            '\n'.join(
+                '{:>9.2f} ms {:>5} {}'.format(duration * 1000, calls, key)
+                for key, duration, calls in profile.top()
+            )
+        )
+
+
+class ReplicaPinMiddleware:
+    """
+    Закрепляет пользователя за основной базой на REPLICA_PIN_SECONDS
+    после запроса, в котором что-то записывалось в базу.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.reset()
+        request.replica_pinned = routers.PIN_COOKIE in request.COOKIES
+        response = self.get_response(request)
+        if routers.wrote():
+            response.set_cookie(
+                routers.PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        if response.streaming:
+            # Состояние нужно отложенным частям страницы.
+            response.streaming_content = self.stream(
+                response.streaming_content
+            )
+        else:
+            routers.reset()
+        return response
+
+    def stream(self, content):
+        try:
+            yield from content
+        finally:
+            routers.reset()
+
+
+def gzip_compressor():
+    # wbits=31: поток deflate в формате gzip.
+    return zlib.compressobj(settings.COMPRESSION_LEVEL, zlib.DEFLATED, 31)
+
+
+def gzip_sequence(sequence):
+    """Сжимает куски по мере поступления, не задерживая их в буфере."""
+    compressor = gzip_compressor()
+    for chunk in sequence:
+        if chunk:
+            yield (
+                compressor.compress(chunk)
+                + compressor.flush(zlib.Z_SYNC_FLUSH)
+            )
+    yield compressor.flush()
+
+
+class CompressionMiddleware:
+    """
+    Сжимает в gzip текстовые ответы не короче COMPRESSION_MIN_SIZE.
+    Потоковые ответы сжимаются по кускам, поэтому начало страницы
+    уходит клиенту, не дожидаясь конца.
+    """
+    def __init__(self, get_response):
+        if not settings.COMPRESSION_LEVEL:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        content_type = response.get('Content-Type', '').split(';', 1)[0]
+        if (response.has_header('Content-Encoding')
+                or content_type not in settings.COMPRESSION_TYPES
+                or not response.streaming
+                and len(response.content) < settings.COMPRESSION_MIN_SIZE):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not accepts_gzip.search(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        ):
+            return response
+        if response.streaming:
+            response.streaming_content = gzip_sequence(
+                response.streaming_content
+            )
+            del response['Content-Length']
+        else:
+            compressor = gzip_compressor()
+            content = compressor.compress(response.content)
+            content += compressor.flush()
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+        # Сжатое тело уже не совпадает побайтно: ETag становится слабым.
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = 'gzip'
+        return response
@@ -0,0 +1,112 @@
+"""
+Профилирование отрисовки шаблонов.
+
+Для каждого запроса считается время шаблонов, подключённых через
+include шаблонов и тегов (for, url, thumbnail и т. п.). Время
+включает вложенную отрисовку; повторный вход в ту же запись,
+например вложенный for, не учитывается дважды.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.template.base import Node, Template, TokenType
+
+_local = threading.local()
+
+
+class TemplateProfile:
+    """Время и число вызовов по записям вида 'tag:thumbnail'."""
+
+    def __init__(self):
+        self.durations = Counter()
+        self.calls = Counter()
+        self.active = Counter()
+        self.including = 0
+
+    def __enter__(self):
+        _local.current = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _local.current = None
+
+    def measure(self, key, render, *args):
+        self.active[key] += 1
+        start = time.perf_counter()
+        try:
+            return render(*args)
+        finally:
+            self.active[key] -= 1
+            self.calls[key] += 1
+            if not self.active[key]:
+                self.durations[key] += time.perf_counter() - start
+
+    def top(self, limit=None):
+        """Записи (ключ, секунды, вызовы) от самых долгих."""
+        return [
+            (key, duration, self.calls[key])
+            for key, duration in self.durations.most_common(limit)
+        ]
+
+    def server_timing(self, limit):
+        """Значение заголовка Server-Timing для инструментов браузера."""
+        return ', '.join(
+            't{};desc="{} x{}";dur={:.2f}'.format(
+                number, key, calls, duration * 1000
+            )
+            for number, (key, duration, calls) in enumerate(self.top(limit))
+        )
+
+
+def current():
+    return getattr(_local, 'current', None)
+
+
+def tag_name(node):
+    token = getattr(node, 'token', None)
+    if token is None or token.token_type != TokenType.BLOCK:
+        return None
+    return token.contents.split(None, 1)[0]
+
+
+def instrument():
+    """Оборачивает отрисовку шаблонов и тегов; вызывается один раз."""
+    if getattr(Template._render, 'profiled', False):
+        return
+    original_render = Template._render
+    original_render_annotated = Node.render_annotated
+
+    def _render(self, context):
+        profile = current()
+        if profile is None:
+            return original_render(self, context)
+        kind = 'include' if profile.including else 'template'
+        including, profile.including = profile.including, 0
+        try:
+            return profile.measure(
+                '{}:{}'.format(kind, self.origin.template_name or self.name),
+                original_render, self, context
+            )
+        finally:
+            profile.including = including
+
+    def render_annotated(self, context):
+        profile = current()
+        name = tag_name(self) if profile is not None else None
+        if name is None:
+            return original_render_annotated(self, context)
+        if name == 'include':
+            # Время include учитывается по имени подключённого шаблона.
+            profile.including += 1
+            try:
+                return original_render_annotated(self, context)
+            finally:
+                profile.including -= 1
+        return profile.measure(
+            'tag:' + name, original_render_annotated, self, context
+        )
+
+    _render.profiled = True
+    Template._render = _render
+    Node.render_annotated = render_annotated
@@ -0,0 +1,95 @@
+"""
+Маршрутизация чтения на реплики базы.
+
+Чтения уходят на реплику только внутри view, помеченных replica_reads,
+и только пока в запросе ничего не записано. После записи пользователь
+на REPLICA_PIN_SECONDS закрепляется за основной базой, чтобы сразу
+видеть свои изменения, которые до реплики ещё не дошли.
+
+Прочитанное с реплики может отставать: conditional_page по replica_used
+не выдаёт ETag, пока версия страницы моложе REPLICA_PIN_SECONDS.
+"""
+import random
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .streaming import stream_within
+
+PIN_COOKIE = 'primary_pin'
+
+_local = threading.local()
+
+
+def reset():
+    """Сбрасывает состояние потока перед новым запросом."""
+    _local.use_replicas = False
+    _local.wrote = False
+    _local.replica_used = False
+
+
+def wrote():
+    return getattr(_local, 'wrote', False)
+
+
+def replica_used():
+    """Читались ли в этом запросе данные с реплики."""
+    return getattr(_local, 'replica_used', False)
+
+
+def choose_replica():
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+@contextmanager
+def reading_from_replicas(enabled=True):
+    previous = getattr(_local, 'use_replicas', False)
+    _local.use_replicas = enabled
+    try:
+        yield
+    finally:
+        _local.use_replicas = previous
+
+
+def replica_reads(view):
+    """
+    Разрешает view читать с реплик, если пользователь
+    не закреплён за основной базой.
+    """
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        pinned = getattr(request, 'replica_pinned', False)
+        with reading_from_replicas(not pinned):
+            response = view(request, *args, **kwargs)
+        if response.streaming:
+            # Отложенные части читают ту же базу, что и начало страницы.
+            response.streaming_content = stream_within(
+                reading_from_replicas(not pinned),
+                response.streaming_content,
+            )
+        return response
+    return inner
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (not settings.DATABASE_REPLICAS
+                or not getattr(_local, 'use_replicas', False)
+                or wrote()):
+            return DEFAULT_DB_ALIAS
+        _local.replica_used = True
+        return choose_replica()
+
+    def db_for_write(self, model, **hints):
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, связи между ними допустимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,137 @@
+"""
+Раздача собранной статики прямо из WSGI, минуя Django.
+
+Файлы STATIC_ROOT один раз сканируются при старте. Запрос к ним
+не доходит до view и middleware: ответ собирается по готовой
+таблице, а тело отдаёт wsgi.file_wrapper сервера.
+"""
+import hashlib
+import json
+import mimetypes
+import os
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.utils.http import http_date
+
+# Порядок предпочтения: сначала самые маленькие копии.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+CHUNK_SIZE = 64 * 1024
+
+
+class StaticFile:
+    def __init__(self, path, headers):
+        self.path = path
+        self.headers = headers
+        self.size = os.path.getsize(path)
+        self.etag = headers[0][1]
+
+
+def accepts(environ, encoding):
+    accepted = environ.get('HTTP_ACCEPT_ENCODING', '')
+    return any(
+        part.split(';', 1)[0].strip() == encoding
+        for part in accepted.split(',')
+    )
+
+
+class StaticFiles:
+    """
+    WSGI-обёртка: отвечает на запросы к STATIC_URL из STATIC_ROOT,
+    остальные передаёт приложению. Файлы с хэшем в имени кэшируются
+    навсегда, прочие — на STATIC_MAX_AGE секунд.
+    """
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.root = root or settings.STATIC_ROOT
+        self.prefix = prefix or settings.STATIC_URL
+        self.files = self.scan() if self.root else {}
+
+    def hashed_names(self):
+        manifest = os.path.join(self.root, 'staticfiles.json')
+        try:
+            with open(manifest) as file:
+                return set(json.load(file)['paths'].values())
+        except (OSError, ValueError, KeyError):
+            return set()
+
+    def scan(self):
+        files = {}
+        hashed = self.hashed_names()
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, self.root).replace(
+                    os.sep, '/'
+                )
+                if relative.endswith(tuple(
+                    suffix for _, suffix in ENCODINGS
+                )):
+                    continue
+                files[self.prefix + relative] = self.describe(
+                    path, relative in hashed
+                )
+        return files
+
+    def describe(self, path, immutable):
+        """Варианты файла по кодировке с готовыми заголовками."""
+        stat = os.stat(path)
+        content_type = (
+            mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        )
+        if content_type.startswith('text/') or content_type in (
+            'application/javascript', 'image/svg+xml'
+        ):
+            content_type += '; charset=utf-8'
+        if immutable:
+            cache_control = 'public, max-age={}, immutable'.format(
+                settings.STATIC_IMMUTABLE_MAX_AGE
+            )
+        else:
+            cache_control = 'public, max-age={}'.format(
+                settings.STATIC_MAX_AGE
+            )
+        tag = hashlib.md5('{}:{}:{}'.format(
+            path, stat.st_size, stat.st_mtime
+        ).encode()).hexdigest()
+        common = [
+            ('Content-Type', content_type),
+            ('Cache-Control', cache_control),
+            ('Last-Modified', http_date(stat.st_mtime)),
+            ('Vary', 'Accept-Encoding'),
+        ]
+        variants = {}
+        for encoding, suffix in ENCODINGS:
+            if os.path.exists(path + suffix):
+                variants[encoding] = StaticFile(path + suffix, [
+                    ('ETag', '"{}-{}"'.format(tag, encoding))
+                ] + common + [('Content-Encoding', encoding)])
+        variants[None] = StaticFile(
+            path, [('ETag', '"{}"'.format(tag))] + common
+        )
+        return variants
+
+    def __call__(self, environ, start_response):
+        variants = self.files.get(environ.get('PATH_INFO', ''))
+        if variants is None:
+            return self.application(environ, start_response)
+        method = environ['REQUEST_METHOD']
+        if method not in ('GET', 'HEAD'):
+            start_response('405 Method Not Allowed', [('Allow', 'GET, HEAD')])
+            return [b'']
+        static_file = variants[None]
+        for encoding, _ in ENCODINGS:
+            if encoding in variants and accepts(environ, encoding):
+                static_file = variants[encoding]
+                break
+        if environ.get('HTTP_IF_NONE_MATCH') == static_file.etag:
+            start_response('304 Not Modified', static_file.headers)
+            return [b'']
+        start_response('200 OK', static_file.headers + [
+            ('Content-Length', str(static_file.size))
+        ])
+        if method == 'HEAD':
+            return [b'']
+        file_wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return file_wrapper(open(static_file.path, 'rb'), CHUNK_SIZE)
@@ -0,0 +1,277 @@
+"""
+Хранилища файлов.
+
+Статика для collectstatic: имена с хэшем содержимого и заранее
+сжатые копии файлов для core.static.StaticFiles.
+
+Медиа: файлы из MEDIA_SHARDED_DIRS раскладываются по подкаталогам
+по хэшу имени (posts/3f/a2/имя.webp), чтобы в одном каталоге
+не копились сотни тысяч файлов. ShardedFileSystemStorage пишет
+на диск, ObjectStorage — в объектное хранилище вроде S3.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import tempfile
+from datetime import datetime
+from urllib.parse import quote, unquote, urljoin
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, Storage
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSED_EXTENSIONS = (
+    '.css', '.js', '.svg', '.html', '.txt', '.json', '.xml', '.ico',
+)
+
+
+def compress_file(path):
+    """
+    Пишет рядом с файлом .gz и, если установлен brotli, .br.
+    Копия остаётся, только если она меньше оригинала.
+    """
+    with open(path, 'rb') as source:
+        data = source.read()
+    variants = {'.gz': gzip.compress(data, 9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data)
+    written = []
+    for suffix, compressed in variants.items():
+        if len(compressed) >= len(data):
+            continue
+        with open(path + suffix, 'wb') as target:
+            target.write(compressed)
+        written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    После collectstatic в STATIC_ROOT лежат файлы вида
+    bootstrap.min.3f2a9c.css, их сжатые копии и манифест.
+    """
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # collectstatic ещё не запускали, например в тестах.
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if (name.endswith(COMPRESSED_EXTENSIONS)
+                    and os.path.getsize(self.path(name))
+                    >= settings.STATIC_COMPRESS_MIN_SIZE):
+                compress_file(self.path(name))
+
+
+def shard_name(name):
+    """
+    posts/имя -> posts/3f/a2/имя для каталогов из MEDIA_SHARDED_DIRS.
+    Уже разложенные и прочие имена не меняются.
+    """
+    directory, basename = os.path.split(name)
+    if directory not in settings.MEDIA_SHARDED_DIRS:
+        return name
+    digest = hashlib.md5(basename.encode()).hexdigest()
+    parts = [
+        digest[level * 2:level * 2 + 2]
+        for level in range(settings.MEDIA_SHARD_DEPTH)
+    ]
+    return '/'.join([directory] + parts + [basename])
+
+
+class ShardedNamesMixin:
+    """Раскладывает по подкаталогам имена новых файлов."""
+
+    def generate_filename(self, filename):
+        return shard_name(super().generate_filename(filename))
+
+    def get_available_name(self, name, max_length=None):
+        return super().get_available_name(shard_name(name), max_length)
+
+
+@deconstructible
+class ShardedFileSystemStorage(ShardedNamesMixin, FileSystemStorage):
+    """
+    Файловое хранилище с подкаталогами. Файл сначала пишется
+    во временный рядом с целевым и появляется под своим именем
+    целиком: читатели не видят недописанных картинок.
+    """
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(
+            dir=directory, prefix='.upload-'
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(
+                        chunk if isinstance(chunk, bytes) else chunk.encode()
+                    )
+                file.flush()
+                os.fsync(file.fileno())
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary, self.file_permissions_mode)
+            while True:
+                try:
+                    # link, в отличие от rename, не затирает чужой файл.
+                    os.link(temporary, full_path)
+                    break
+                except FileExistsError:
+                    name = self.get_available_name(name)
+                    full_path = self.path(name)
+        finally:
+            os.remove(temporary)
+        return name.replace('\\', '/')
+
+
+class ObjectNotFound(Exception):
+    pass
+
+
+class LocalObjectStore:
+    """
+    Объектное хранилище в каталоге — замена S3 для разработки
+    и тестов без сети. Как в S3, ключи плоские, объект записывается
+    целиком и заменяется атомарно, а «каталоги» — это общие
+    префиксы ключей при выборке.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        for directory in ('objects', 'meta', 'tmp'):
+            os.makedirs(os.path.join(root, directory), exist_ok=True)
+
+    def _path(self, directory, key):
+        return os.path.join(self.root, directory, quote(key, safe=''))
+
+    def put_object(self, key, body, content_type=None):
+        digest = hashlib.md5()
+        descriptor, temporary = tempfile.mkstemp(
+            dir=os.path.join(self.root, 'tmp')
+        )
+        with os.fdopen(descriptor, 'wb') as file:
+            for chunk in body:
+                digest.update(chunk)
+                file.write(chunk)
+        meta = {
+            'ContentType': content_type or 'application/octet-stream',
+            'ETag': '"{}"'.format(digest.hexdigest()),
+        }
+        with open(temporary + '.meta', 'w') as file:
+            json.dump(meta, file)
+        os.replace(temporary + '.meta', self._path('meta', key))
+        os.replace(temporary, self._path('objects', key))
+        return meta['ETag']
+
+    def head_object(self, key):
+        try:
+            stat = os.stat(self._path('objects', key))
+            with open(self._path('meta', key)) as file:
+                meta = json.load(file)
+        except FileNotFoundError:
+            raise ObjectNotFound(key)
+        meta.update(
+            ContentLength=stat.st_size,
+            LastModified=datetime.fromtimestamp(
+                stat.st_mtime, timezone.utc
+            ),
+        )
+        return meta
+
+    def get_object(self, key):
+        try:
+            return open(self._path('objects', key), 'rb')
+        except FileNotFoundError:
+            raise ObjectNotFound(key)
+
+    def delete_object(self, key):
+        for directory in ('objects', 'meta'):
+            try:
+                os.remove(self._path(directory, key))
+            except FileNotFoundError:
+                pass
+
+    def list_objects(self, prefix='', delimiter=None):
+        """Ключи с префиксом и, при delimiter, общие префиксы."""
+        keys, prefixes = [], set()
+        for quoted in os.listdir(os.path.join(self.root, 'objects')):
+            key = unquote(quoted)
+            if not key.startswith(prefix):
+                continue
+            rest = key[len(prefix):]
+            if delimiter and delimiter in rest:
+                prefixes.add(prefix + rest.split(delimiter, 1)[0] + delimiter)
+            else:
+                keys.append(key)
+        return sorted(keys), sorted(prefixes)
+
+
+@deconstructible
+class ObjectStorage(ShardedNamesMixin, Storage):
+    """
+    Хранилище Django поверх объектного хранилища. Клиент должен
+    уметь put_object, get_object, head_object, delete_object
+    и list_objects; по умолчанию это LocalObjectStore
+    в OBJECT_STORAGE_ROOT.
+    """
+
+    def __init__(self, client=None, base_url=None):
+        self.client = client or LocalObjectStore(settings.OBJECT_STORAGE_ROOT)
+        self.base_url = base_url or settings.MEDIA_URL
+
+    def _open(self, name, mode='rb'):
+        return File(self.client.get_object(name), name)
+
+    def _save(self, name, content):
+        self.client.put_object(
+            name, content.chunks(), mimetypes.guess_type(name)[0]
+        )
+        return name
+
+    def delete(self, name):
+        self.client.delete_object(name)
+
+    def exists(self, name):
+        try:
+            self.client.head_object(name)
+        except ObjectNotFound:
+            return False
+        return True
+
+    def listdir(self, path):
+        prefix = path.rstrip('/') + '/' if path else ''
+        keys, prefixes = self.client.list_objects(prefix, '/')
+        return (
+            [name[len(prefix):].rstrip('/') for name in prefixes],
+            [name[len(prefix):] for name in keys],
+        )
+
+    def size(self, name):
+        return self.client.head_object(name)['ContentLength']
+
+    def url(self, name):
+        return urljoin(self.base_url, quote(name))
+
+    def get_modified_time(self, name):
+        return self.client.head_object(name)['LastModified']
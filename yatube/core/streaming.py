@@ -0,0 +1,63 @@
+"""
+Потоковая отрисовка страниц.
+
+Медленные части страницы описываются объектами Deferred и выводятся
+в шаблоне тегом {% deferred %}. В потоковом режиме на их месте
+остаются метки: начало страницы уходит клиенту сразу, а каждая часть
+запрашивает свои данные и отрисовывается уже после него.
+
+Отложенные части отрисовываются, когда view и middleware уже
+вернули ответ, поэтому контексты, которые должны их охватывать
+(реплики, метрики, профилирование), оборачивают streaming_content
+через stream_within.
+"""
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+
+STREAMING_KEY = 'streaming_parts'
+
+
+def stream_within(manager, content):
+    """Отдаёт куски content, оставаясь внутри контекста manager."""
+    with manager:
+        yield from content
+
+
+class Deferred:
+    """Шаблон части страницы и функция, которая готовит его контекст."""
+
+    def __init__(self, template_name, get_context):
+        self.template_name = template_name
+        self.get_context = get_context
+        self.marker = None
+        self.context = None
+
+    def render(self, request):
+        context = dict(self.context, **self.get_context())
+        return get_template(self.template_name).render(context, request)
+
+
+def render_page(request, template_name, context, streaming=None):
+    """
+    Как render(), но при STREAMING_PAGES отдаёт StreamingHttpResponse,
+    в котором части Deferred отрисовываются после начала страницы.
+    """
+    if streaming is None:
+        streaming = settings.STREAMING_PAGES
+    if not streaming:
+        return HttpResponse(render_to_string(template_name, context, request))
+    parts = []
+    page = render_to_string(
+        template_name, dict(context, **{STREAMING_KEY: parts}), request
+    )
+
+    def chunks():
+        rest = page
+        for part in parts:
+            head, rest = rest.split(part.marker, 1)
+            yield head
+            yield part.render(request)
+        yield rest
+
+    return StreamingHttpResponse(chunks())
@@ -0,0 +1,63 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from core.cache import Uncached, get_or_rebuild
+
+register = template.Library()
+
+FRAGMENT_STATE = 'cache_fragment_state'
+
+
+def skip_fragment_cache(context):
+    """Не сохранять в кэш фрагмент, внутри которого отрисовывается тег."""
+    state = context.get(FRAGMENT_STATE)
+    if state is not None:
+        state['skip'] = True
+
+
+class CacheFragmentNode(template.Node):
+    def __init__(self, nodelist, expire_time, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.expire_time = expire_time
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        timeout = self.expire_time.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = make_template_fragment_key(self.fragment_name, vary_on)
+
+        def build():
+            state = {'skip': False}
+            with context.push({FRAGMENT_STATE: state}):
+                value = self.nodelist.render(context)
+            return Uncached(value) if state['skip'] else value
+
+        return get_or_rebuild(
+            key,
+            build,
+            timeout,
+            prefix=self.fragment_name,
+        )
+
+
+@register.tag
+def cache_fragment(parser, token):
+    """
+    Аналог {% cache %} с защитой от одновременной пересборки:
+    {% cache_fragment timeout name [vary_on ...] %}
+    Ключи совместимы с make_template_fragment_key.
+    """
+    nodelist = parser.parse(('endcache_fragment',))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 3:
+        raise template.TemplateSyntaxError(
+            "'{}' tag requires at least 2 arguments.".format(tokens[0])
+        )
+    return CacheFragmentNode(
+        nodelist,
+        parser.compile_filter(tokens[1]),
+        tokens[2],
+        [parser.compile_filter(token) for token in tokens[3:]],
+    )
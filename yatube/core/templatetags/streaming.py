@@ -0,0 +1,26 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core.streaming import STREAMING_KEY
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def deferred(context, part):
+    """
+    Выводит часть страницы Deferred: сразу или, при потоковой
+    отрисовке, меткой, вместо которой её отдаст render_page.
+    """
+    parts = context.get(STREAMING_KEY)
+    if parts is None:
+        with context.push(**part.get_context()):
+            return context.template.engine.get_template(
+                part.template_name
+            ).render(context)
+    part.marker = '<!--deferred:{}-->'.format(len(parts))
+    part.context = context.flatten()
+    # Вложенные части отрисовываются вместе с этой.
+    del part.context[STREAMING_KEY]
+    parts.append(part)
+    return mark_safe(part.marker)
@@ -6,3 +6,19 @@ register = template.Library()
 @register.filter
 def addclass(field, css):
     return field.as_widget(attrs={'class': css})
+
+
+@register.simple_tag(takes_context=True)
+def page_query(context, **changes):
+    """
+    Строка запроса текущей страницы с заменёнными параметрами
+    постраничного вывода; остальные параметры сохраняются.
+    Параметр со значением None удаляется.
+    """
+    params = context['request'].GET.copy()
+    for name in ('page', 'cursor'):
+        params.pop(name, None)
+    for name, value in changes.items():
+        if value is not None:
+            params[name] = value
+    return params.urlencode()
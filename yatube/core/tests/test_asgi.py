@@ -0,0 +1,115 @@
+import asyncio
+
+from django.core.wsgi import get_wsgi_application
+from django.test import SimpleTestCase
+
+from core.asgi import AsgiHandler
+
+
+def echo_application(environ, start_response):
+    """WSGI-приложение, которое по кускам возвращает тело запроса."""
+    body = environ['wsgi.input'].read()
+    start_response('201 Created', [
+        ('Content-Type', 'text/plain'),
+        ('X-Path', environ['PATH_INFO']),
+        ('X-Query', environ['QUERY_STRING']),
+        ('X-Header', environ.get('HTTP_X_TEST', '')),
+    ])
+    return iter([b'got:', body, b'', b'!'])
+
+
+def failing_application(environ, start_response):
+    raise RuntimeError('boom')
+
+
+def http_scope(path, method='GET', query_string=b'', headers=()):
+    return {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'query_string': query_string,
+        'headers': list(headers),
+        'server': ('testserver', 80),
+        'client': ('127.0.0.1', 1234),
+    }
+
+
+def call(application, scope, chunks=(b'',)):
+    messages = [
+        {'type': 'http.request', 'body': chunk,
+         'more_body': number < len(chunks) - 1}
+        for number, chunk in enumerate(chunks)
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    return sent
+
+
+class AsgiHandlerTests(SimpleTestCase):
+    def setUp(self):
+        self.handler = AsgiHandler(echo_application, max_workers=2)
+
+    def test_request_and_streamed_response(self):
+        """Тело и заголовки доходят до приложения, ответ идёт кусками."""
+        sent = call(
+            self.handler,
+            http_scope(
+                '/путь/', 'POST', b'a=1',
+                [(b'x-test', b'value'), (b'content-type', b'text/plain')]
+            ),
+            chunks=(b'hello ', b'world'),
+        )
+        start, *body = sent
+        self.assertEqual(start['status'], 201)
+        headers = dict(start['headers'])
+        self.assertEqual(headers[b'x-query'], b'a=1')
+        self.assertEqual(headers[b'x-header'], b'value')
+        self.assertEqual(headers[b'x-path'], '/путь/'.encode())
+        self.assertEqual(
+            b''.join(message['body'] for message in body),
+            b'got:hello world!'
+        )
+        self.assertTrue(body[0]['more_body'])
+        self.assertFalse(body[-1].get('more_body', False))
+
+    def test_application_error_is_raised(self):
+        handler = AsgiHandler(failing_application, max_workers=1)
+        with self.assertRaisesMessage(RuntimeError, 'boom'):
+            call(handler, http_scope('/'))
+
+    def test_lifespan(self):
+        messages = [
+            {'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}
+        ]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(self.handler({'type': 'lifespan'}, receive, send))
+        self.assertEqual(
+            sent,
+            ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+        )
+
+    def test_django_page(self):
+        """Страница Django отдаётся через пул потоков."""
+        handler = AsgiHandler(get_wsgi_application(), max_workers=1)
+        start, *body = call(handler, http_scope('/about/author/'))
+        self.assertEqual(start['status'], 200)
+        self.assertIn(
+            'Об авторе'.encode(),
+            b''.join(message['body'] for message in body)
+        )
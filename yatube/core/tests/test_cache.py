@@ -0,0 +1,41 @@
+import time
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.cache import Uncached, get_or_rebuild, reset_stats, stats
+
+
+class GetOrRebuildTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_stats()
+
+    def test_fresh_value_is_not_rebuilt(self):
+        """Свежее значение берётся из кэша."""
+        get_or_rebuild('feed:1', lambda: 'первое', 60)
+        value = get_or_rebuild('feed:1', lambda: 'второе', 60)
+        self.assertEqual(value, 'первое')
+        self.assertEqual(stats()['feed'], {'miss': 1, 'rebuild': 1, 'hit': 1})
+
+    def test_stale_value_served_while_rebuilding(self):
+        """Пока значение пересобирает другой процесс, отдаётся старое."""
+        cache.set('feed:1', ('старое', time.time() - 1), 60)
+        cache.add('feed:1:rebuild', 1, 30)
+        value = get_or_rebuild('feed:1', lambda: 'новое', 60)
+        self.assertEqual(value, 'старое')
+        self.assertEqual(stats()['feed'], {'stale': 1})
+
+    def test_stale_value_rebuilt_by_lock_owner(self):
+        """Устаревшее значение пересобирает захвативший блокировку."""
+        cache.set('feed:1', ('старое', time.time() - 1), 60)
+        value = get_or_rebuild('feed:1', lambda: 'новое', 60)
+        self.assertEqual(value, 'новое')
+        self.assertIsNone(cache.get('feed:1:rebuild'))
+        self.assertEqual(stats()['feed'], {'rebuild': 1})
+
+    def test_uncached_value_not_stored(self):
+        """Значение Uncached отдаётся, но не кэшируется."""
+        value = get_or_rebuild('feed:1', lambda: Uncached('заглушка'), 60)
+        self.assertEqual(value, 'заглушка')
+        self.assertIsNone(cache.get('feed:1'))
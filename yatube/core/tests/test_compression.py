@@ -0,0 +1,71 @@
+import shutil
+import tempfile
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+
+TEMP_CACHE_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+# ETag страниц выдаётся только при кэше, общем для процессов.
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': TEMP_CACHE_ROOT,
+}})
+class CompressionMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='auth')
+        for number in range(10):
+            cls.post = Post.objects.create(
+                text=f'Тестовый пост {number}', author=cls.author
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client(HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+    def test_page_compressed(self):
+        plain = Client().get(reverse('posts:index'))
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(
+            zlib.decompress(response.content, 31), plain.content
+        )
+        self.assertTrue(response['ETag'].startswith('W/'))
+
+    def test_weak_etag_revalidates(self):
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    @override_settings(COMPRESSION_MIN_SIZE=10 ** 6)
+    def test_small_response_not_compressed(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_streaming_page_flushed_by_chunks(self):
+        """Первый сжатый кусок распаковывается без остальных."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        decompressor = zlib.decompressobj(31)
+        chunks = iter(response.streaming_content)
+        first = b''
+        while self.post.text.encode() not in first:
+            first += decompressor.decompress(next(chunks))
+        rest = b''.join(decompressor.decompress(chunk) for chunk in chunks)
+        self.assertIn(b'</html>', rest)
@@ -0,0 +1,136 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+
+from core.db import retry_on_lock
+
+LOCKED = OperationalError('database is locked')
+
+
+class SqliteConcurrencyTests(SimpleTestCase):
+    """Чтение из файловой базы во время чужой записи."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'concurrency.sqlite3')
+
+    def connect(self):
+        settings_dict = dict(
+            connections['default'].settings_dict,
+            NAME=self.path, OPTIONS={'timeout': 0.1},
+        )
+        return DatabaseWrapper(settings_dict, alias='concurrency')
+
+    def read_during_write(self):
+        """
+        Читает базу в другом потоке, пока писатель держит
+        эксклюзивную транзакцию. Возвращает (результат, секунды).
+        """
+        writer = self.connect()
+        self.addCleanup(writer.close)
+        with writer.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (value integer)')
+            cursor.execute('INSERT INTO item VALUES (1)')
+            cursor.execute('BEGIN EXCLUSIVE')
+            cursor.execute('INSERT INTO item VALUES (2)')
+        result = {}
+
+        def read():
+            reader = self.connect()
+            start = time.perf_counter()
+            try:
+                with reader.cursor() as cursor:
+                    cursor.execute('SELECT count(*) FROM item')
+                    result['value'] = cursor.fetchone()[0]
+            except OperationalError as error:
+                result['value'] = error
+            finally:
+                result['seconds'] = time.perf_counter() - start
+                reader.close()
+
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+        with writer.cursor() as cursor:
+            cursor.execute('COMMIT')
+        return result['value'], result['seconds']
+
+    def test_pragmas_applied(self):
+        connection = self.connect()
+        self.addCleanup(connection.close)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(
+                cursor.fetchone()[0],
+                settings.SQLITE_PRAGMAS['busy_timeout']
+            )
+        self.assertIn(retry_on_lock, connection.execute_wrappers)
+
+    def test_wal_readers_not_blocked_by_writer(self):
+        """В WAL читатель сразу видит последнюю зафиксированную версию."""
+        value, seconds = self.read_during_write()
+        self.assertEqual(value, 1)
+        self.assertLess(seconds, 0.1)
+
+    @override_settings(
+        SQLITE_PRAGMAS={'journal_mode': 'DELETE', 'busy_timeout': 100},
+        SQLITE_LOCK_RETRIES=1, SQLITE_LOCK_BACKOFF=0.01,
+    )
+    def test_rollback_journal_blocks_readers(self):
+        """Без WAL тот же читатель упирается в блокировку."""
+        value, _ = self.read_during_write()
+        self.assertIsInstance(value, OperationalError)
+
+
+class RetryOnLockTests(SimpleTestCase):
+    class Connection:
+        in_atomic_block = False
+
+    def execute_failing(self, failures):
+        calls = []
+
+        def execute(sql, params, many, context):
+            calls.append(sql)
+            if len(calls) <= failures:
+                raise LOCKED
+            return 'done'
+        return execute, calls
+
+    @override_settings(SQLITE_LOCK_RETRIES=3, SQLITE_LOCK_BACKOFF=0)
+    def test_retries_until_success(self):
+        execute, calls = self.execute_failing(2)
+        context = {'connection': self.Connection()}
+        self.assertEqual(
+            retry_on_lock(execute, 'SELECT 1', None, False, context), 'done'
+        )
+        self.assertEqual(len(calls), 3)
+
+    @override_settings(SQLITE_LOCK_RETRIES=3, SQLITE_LOCK_BACKOFF=0)
+    def test_gives_up(self):
+        execute, calls = self.execute_failing(10)
+        context = {'connection': self.Connection()}
+        with self.assertRaises(OperationalError):
+            retry_on_lock(execute, 'SELECT 1', None, False, context)
+        self.assertEqual(len(calls), 4)
+
+    @override_settings(SQLITE_LOCK_RETRIES=3, SQLITE_LOCK_BACKOFF=0)
+    def test_no_retry_inside_transaction(self):
+        execute, calls = self.execute_failing(1)
+        connection = self.Connection()
+        connection.in_atomic_block = True
+        with self.assertRaises(OperationalError):
+            retry_on_lock(
+                execute, 'SELECT 1', None, False,
+                {'connection': connection}
+            )
+        self.assertEqual(len(calls), 1)
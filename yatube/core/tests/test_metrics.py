@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import cache as core_cache
+from core.metrics import CACHE_PREFIXES, registry
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@mail.ru', password='pass'
+        )
+        cls.user = User.objects.create_user(username='user')
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    @override_settings(METRICS_SAMPLE_RATE=1)
+    def test_metrics_collected_per_view(self):
+        """Метрики собираются по имени URL."""
+        self.client.get(reverse('posts:index'))
+        view = registry.as_dict()['posts:index']
+        self.assertEqual(view['request_duration_seconds']['count'], 1)
+        self.assertGreater(view['sql_queries']['sum'], 0)
+        self.assertGreater(view['template_render_seconds']['sum'], 0)
+        self.assertGreater(view['response_size_bytes']['sum'], 0)
+
+    @override_settings(METRICS_SAMPLE_RATE=1, STREAMING_PAGES=True)
+    def test_streamed_parts_measured(self):
+        """Запросы отложенных частей страницы попадают в метрики."""
+        post = Post.objects.create(text='Тестовый пост', author=self.user)
+        Comment.objects.create(text='Коммент', post=post, author=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:post_detail', kwargs={'post_id': post.pk})
+            )
+            self.assertNotIn('posts:post_detail', registry.as_dict())
+            content = b''.join(response.streaming_content)
+        self.assertIn('Коммент', content.decode())
+        view = registry.as_dict()['posts:post_detail']
+        self.assertEqual(view['sql_queries']['sum'], len(queries))
+        self.assertEqual(view['response_size_bytes']['sum'], len(content))
+
+    def test_metrics_off_without_sampling(self):
+        """При METRICS_SAMPLE_RATE = 0 метрики не собираются."""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(list(registry.as_dict()), [CACHE_PREFIXES])
+
+    @override_settings(METRICS_SAMPLE_RATE=1)
+    def test_metrics_endpoint_prometheus_format(self):
+        """Эндпоинт отдаёт метрики в формате Prometheus."""
+        self.client.get(reverse('posts:index'))
+        response = self.admin_client.get(reverse('core:metrics'))
+        self.assertContains(
+            response,
+            'yatube_request_duration_seconds_count{view="posts:index"} 1'
+        )
+        response = self.admin_client.get(
+            reverse('core:metrics'), {'format': 'json'}
+        )
+        self.assertIn('posts:index', response.json())
+
+    def test_cache_events_per_prefix(self):
+        """Эндпоинт отдаёт события кэша по префиксам ключей."""
+        Post.objects.create(text='Тестовый пост', author=self.user)
+        core_cache.reset_stats()
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        response = self.admin_client.get(reverse('core:metrics'))
+        self.assertContains(
+            response,
+            'yatube_cache_prefix_events_total{prefix="post_card",event="hit"}'
+        )
+        response = self.admin_client.get(
+            reverse('core:metrics'), {'format': 'json'}
+        )
+        self.assertIn('miss', response.json()[CACHE_PREFIXES]['post_card'])
+
+    def test_metrics_endpoint_only_for_staff(self):
+        """Эндпоинт метрик закрыт от обычных пользователей."""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('core:metrics'))
+        self.assertEqual(response.status_code, 302)
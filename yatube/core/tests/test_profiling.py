@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.template import engines
+from django.template.loaders.cached import Loader
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+
+
+class CachedTemplatesTests(TestCase):
+    def test_templates_parsed_once(self):
+        engine = engines['django'].engine
+        self.assertIsInstance(engine.template_loaders[0], Loader)
+        first = engine.get_template('includes/postcard.html')
+        self.assertIs(engine.get_template('includes/postcard.html'), first)
+
+
+@override_settings(TEMPLATE_PROFILING=True, TEMPLATE_PROFILING_TOP=50)
+class TemplateProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='auth')
+        group = Group.objects.create(title='Группа', slug='test_slug')
+        for number in range(3):
+            Post.objects.create(
+                text=f'Тестовый пост {number}', author=author, group=group
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_report(self):
+        """Отчёт называет шаблоны, include и теги страницы."""
+        with self.assertLogs('yatube.templates', 'INFO') as logs:
+            response = Client().get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        for key in (
+            'template:posts/index.html x1',
+            'template:base.html x1',
+            'include:includes/postcard.html x3',
+            'tag:url',
+        ):
+            with self.subTest(key=key):
+                self.assertIn(key, timing)
+        self.assertNotIn('tag:include', timing)
+        self.assertIn('include:includes/postcard.html', logs.output[0])
+
+    @override_settings(STREAMING_PAGES=True)
+    def test_streamed_parts_profiled(self):
+        """Отложенные части потоковой страницы попадают в отчёт."""
+        post = Post.objects.first()
+        Comment.objects.create(text='Коммент', post=post, author=post.author)
+        response = Client().get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        with self.assertLogs('yatube.templates', 'INFO') as logs:
+            b''.join(response.streaming_content)
+        self.assertIn('template:includes/comment_thread.html', logs.output[0])
+
+    @override_settings(TEMPLATE_PROFILING=False)
+    def test_disabled(self):
+        response = Client().get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
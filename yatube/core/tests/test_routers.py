@@ -0,0 +1,141 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import (
+    Client, SimpleTestCase, TestCase, override_settings
+)
+from django.urls import reverse
+
+from core import routers
+from core.db import copy_database
+from posts.fragments import POST_CARD_FRAGMENT
+from posts.models import Post, User
+
+
+@override_settings(DATABASE_REPLICAS=['default'])
+class ReplicaRoutingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.author)
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.client = Client()
+        self.client.force_login(self.author)
+        routers.reset()
+        patcher = mock.patch(
+            'core.routers.choose_replica', return_value='default'
+        )
+        self.choose_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_go_to_primary_by_default(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.choose_replica.assert_not_called()
+
+    def test_no_replica_after_write(self):
+        """После записи чтения в том же запросе идут в основную базу."""
+        with routers.reading_from_replicas():
+            self.router.db_for_read(Post)
+            self.assertEqual(self.choose_replica.call_count, 1)
+            self.router.db_for_write(Post)
+            self.router.db_for_read(Post)
+        self.assertEqual(self.choose_replica.call_count, 1)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        with routers.reading_from_replicas():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.choose_replica.assert_not_called()
+
+    def test_feed_reads_from_replica(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.choose_replica.called)
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    @override_settings(STREAMING_PAGES=True)
+    def test_deferred_parts_read_from_replica(self):
+        """Отложенные части страницы читают ту же базу, что и начало."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.choose_replica.reset_mock()
+        b''.join(response.streaming_content)
+        self.assertTrue(self.choose_replica.called)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': tempfile.mkdtemp(dir=settings.BASE_DIR),
+    }})
+    def test_replica_pages_cached_by_version(self):
+        """
+        Карточки с реплики кэшируются по версии, а ETag страница
+        получает, только когда реплика уже видит последнее изменение.
+        """
+        self.addCleanup(
+            shutil.rmtree, settings.CACHES['default']['LOCATION'],
+            ignore_errors=True,
+        )
+        cache.clear()
+        url = reverse('posts:index')
+        key = make_template_fragment_key(
+            POST_CARD_FRAGMENT, [self.post.pk, self.post.version]
+        )
+        response = self.client.get(url)
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIsNotNone(cache.get(key))
+        response = self.client.get(
+            url, HTTP_COOKIE=routers.PIN_COOKIE + '=1'
+        )
+        self.assertTrue(response.has_header('ETag'))
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            self.assertTrue(self.client.get(url).has_header('ETag'))
+
+    def test_pinned_to_primary_after_write(self):
+        """Автор нового комментария какое-то время читает основную базу."""
+        response = self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Комментарий'},
+        )
+        cookie = response.cookies[routers.PIN_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_PIN_SECONDS)
+        self.choose_replica.reset_mock()
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.assertContains(response, 'Комментарий')
+        self.choose_replica.assert_not_called()
+
+
+class CopyDatabaseTests(SimpleTestCase):
+    def test_copy(self):
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        source = DatabaseWrapper(
+            dict(
+                connection.settings_dict,
+                NAME=os.path.join(directory, 'primary.sqlite3'),
+            ),
+            alias='primary',
+        )
+        self.addCleanup(source.close)
+        with source.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (value integer)')
+            cursor.execute('INSERT INTO item VALUES (1)')
+        path = os.path.join(directory, 'replica.sqlite3')
+        copy_database(source, path)
+        replica = sqlite3.connect(path)
+        self.addCleanup(replica.close)
+        self.assertEqual(
+            replica.execute('SELECT count(*) FROM item').fetchone()[0], 1
+        )
@@ -0,0 +1,95 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+
+from core.static import StaticFiles
+
+CSS = b'body { color: black; }\n' * 100
+
+
+def application(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'django']
+
+
+def call(app, path, method='GET', **headers):
+    environ = {'PATH_INFO': path, 'REQUEST_METHOD': method}
+    environ.update(headers)
+    started = {}
+
+    def start_response(status, response_headers):
+        started['status'] = status
+        started['headers'] = dict(response_headers)
+
+    body = b''.join(app(environ, start_response))
+    return started['status'], started['headers'], body
+
+
+class StaticPipelineTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        source = os.path.join(directory, 'source', 'css')
+        os.makedirs(source)
+        with open(os.path.join(source, 'site.css'), 'wb') as file:
+            file.write(CSS)
+        self.root = os.path.join(directory, 'root')
+        with override_settings(
+            STATICFILES_DIRS=[os.path.dirname(source)],
+            STATIC_ROOT=self.root,
+            STATICFILES_FINDERS=[
+                'django.contrib.staticfiles.finders.FileSystemFinder'
+            ],
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(self.root, 'staticfiles.json')) as file:
+            self.hashed = json.load(file)['paths']['css/site.css']
+        self.app = StaticFiles(application, self.root, '/static/')
+
+    def test_collected_files(self):
+        """collectstatic кладёт файл с хэшем в имени и его сжатую копию."""
+        self.assertNotEqual(self.hashed, 'css/site.css')
+        with gzip.open(
+            os.path.join(self.root, self.hashed + '.gz')
+        ) as file:
+            self.assertEqual(file.read(), CSS)
+
+    def test_hashed_file_cached_forever(self):
+        status, headers, body = call(self.app, '/static/' + self.hashed)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(body, CSS)
+        self.assertIn('immutable', headers['Cache-Control'])
+        self.assertEqual(headers['Content-Length'], str(len(CSS)))
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+
+    def test_plain_name_revalidated(self):
+        _, headers, _ = call(self.app, '/static/css/site.css')
+        self.assertEqual(
+            headers['Cache-Control'],
+            'public, max-age={}'.format(settings.STATIC_MAX_AGE)
+        )
+
+    def test_precompressed_variant(self):
+        status, headers, body = call(
+            self.app, '/static/' + self.hashed,
+            HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(body), CSS)
+        status, _, body = call(
+            self.app, '/static/' + self.hashed,
+            HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=headers['ETag']
+        )
+        self.assertEqual(status, '304 Not Modified')
+        self.assertEqual(body, b'')
+
+    def test_other_paths_go_to_django(self):
+        for path in ('/', '/static/missing.css'):
+            with self.subTest(path=path):
+                self.assertEqual(call(self.app, path)[2], b'django')
@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase, override_settings
+
+from core.storage import (
+    LocalObjectStore, ObjectStorage, ShardedFileSystemStorage, shard_name
+)
+
+
+class ShardNameTests(SimpleTestCase):
+    def test_sharded_dirs_only(self):
+        name = shard_name('posts/picture.webp')
+        self.assertRegex(name, r'^posts/\w\w/\w\w/picture\.webp$')
+        self.assertEqual(shard_name(name), name)
+        self.assertEqual(shard_name('cache/image.webp'), 'cache/image.webp')
+
+    @override_settings(MEDIA_SHARD_DEPTH=1)
+    def test_depth(self):
+        self.assertRegex(
+            shard_name('posts/picture.webp'), r'^posts/\w\w/picture\.webp$'
+        )
+
+
+class StorageTestsMixin:
+    def setUp(self):
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.storage = self.make_storage(directory)
+
+    def test_save_open_delete(self):
+        name = self.storage.save('posts/picture.jpg', ContentFile(b'data'))
+        self.assertEqual(name, shard_name('posts/picture.jpg'))
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(self.storage.size(name), 4)
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), b'data')
+        self.assertTrue(self.storage.url(name).endswith(name))
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+
+    def test_name_conflict(self):
+        """Второй файл с тем же именем получает новое имя."""
+        first = self.storage.save('posts/picture.jpg', ContentFile(b'1'))
+        second = self.storage.save('posts/picture.jpg', ContentFile(b'2'))
+        self.assertNotEqual(first, second)
+        with self.storage.open(first) as file:
+            self.assertEqual(file.read(), b'1')
+
+    def test_listdir(self):
+        name = self.storage.save('posts/picture.jpg', ContentFile(b'data'))
+        shard = name.split('/')[1]
+        self.assertEqual(self.storage.listdir('posts'), ([shard], []))
+        directory = os.path.dirname(name)
+        self.assertEqual(
+            self.storage.listdir(directory), ([], ['picture.jpg'])
+        )
+
+
+class ShardedFileSystemStorageTests(StorageTestsMixin, SimpleTestCase):
+    def make_storage(self, directory):
+        return ShardedFileSystemStorage(location=directory)
+
+    def test_no_temporary_files_left(self):
+        name = self.storage.save('posts/picture.jpg', ContentFile(b'data'))
+        directory = os.path.dirname(self.storage.path(name))
+        self.assertEqual(os.listdir(directory), ['picture.jpg'])
+
+
+class ObjectStorageTests(StorageTestsMixin, SimpleTestCase):
+    def make_storage(self, directory):
+        self.client = LocalObjectStore(directory)
+        return ObjectStorage(self.client, base_url='/media/')
+
+    def test_object_metadata(self):
+        name = self.storage.save('posts/picture.jpg', ContentFile(b'data'))
+        meta = self.client.head_object(name)
+        self.assertEqual(meta['ContentType'], 'image/jpeg')
+        self.assertEqual(meta['ContentLength'], 4)
+        self.assertEqual(meta['ETag'], '"8d777f385d3dfec8815d20f7496026dc"')
@@ -1,6 +1,10 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
 from http import HTTPStatus
 
+from .metrics import registry
+
 
 def page_not_found(request, exception):
     return render(
@@ -21,3 +25,14 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=HTTPStatus.FORBIDDEN)
+
+
+@staff_member_required
+def metrics(request):
+    """Метрики запросов: текст Prometheus или JSON при ?format=json."""
+    if request.GET.get('format') == 'json':
+        return JsonResponse(registry.as_dict())
+    return HttpResponse(
+        registry.as_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -1,5 +1,42 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
 from .models import Post, Group, Follow, Comment
+from .utils import EstimatedCountPaginator
+
+
+class PreloadedAutocompleteSelect(AutocompleteSelect):
+    """
+    Автодополнение, которое подписывает выбранное значение уже
+    загруженным объектом, а не отдельным запросом на каждую строку.
+    """
+    preloaded = None
+
+    def optgroups(self, name, value, attr=None):
+        selected = {str(v) for v in value if v not in ('', None)}
+        if self.preloaded is None or selected != {str(self.preloaded.pk)}:
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '', False, 0))
+        options.append(self.create_option(
+            name, self.preloaded.pk,
+            self.choices.field.label_from_instance(self.preloaded),
+            selected, len(options)
+        ))
+        return [(None, options, 0)]
+
+
+class PostChangeListForm(forms.ModelForm):
+    """
+    Форма строки списка постов.
+    Группа поста уже загружена через list_select_related.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'group' in self.fields and self.instance.group_id:
+            widget = self.fields['group'].widget
+            getattr(widget, 'widget', widget).preloaded = self.instance.group
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -14,12 +51,38 @@ class PostAdmin(admin.ModelAdmin):
         'group'
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
     empty_value_display = '-пусто-'
+    paginator = EstimatedCountPaginator
+    # Не считать COUNT(*) всей таблицы ради «Показать все».
+    show_full_result_count = False
+
+    def get_changelist_form(self, request, **kwargs):
+        return PostChangeListForm
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'group':
+            kwargs['widget'] = PreloadedAutocompleteSelect(
+                db_field.remote_field, self.admin_site,
+                using=kwargs.get('using'),
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class GroupAdmin(admin.ModelAdmin):
+    """
+    Регистрация и настройка отображения модели Group в админке.
+    """
+    list_display = ('pk', 'title', 'slug')
+    search_fields = ('title', 'slug')
+    prepopulated_fields = {'slug': ('title',)}
 
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
 admin.site.register(Follow)
 admin.site.register(Comment)
@@ -0,0 +1,423 @@
+"""
+Генерация данных и замеры производительности страниц постов.
+Используются командами benchmark_data и benchmark_views.
+"""
+import asyncio
+import io
+import itertools
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from faker import Faker
+from mixer.backend.django import mixer
+from PIL import Image
+
+from .counters import recount_all
+from .feed import rebuild_feeds
+from .models import Comment, Follow, Group, Post
+from .search import get_backend as get_search_backend
+from .transfer import keep_dates
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+USERNAME_PREFIX = 'bench_'
+
+
+def zipf_weights(count, exponent):
+    """Веса степенного распределения: вес ранга r равен 1 / r^exponent."""
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def batched(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def make_images(count, seed):
+    """Сохраняет count разноцветных картинок и возвращает их имена."""
+    rnd = random.Random(seed)
+    names = []
+    for number in range(count):
+        output = io.BytesIO()
+        color = tuple(rnd.randrange(256) for _ in range(3))
+        Image.new('RGB', (1200, 800), color).save(output, 'JPEG')
+        names.append(default_storage.save(
+            'posts/bench_{}.jpg'.format(number),
+            ContentFile(output.getvalue())
+        ))
+    return names
+
+
+def generate_comments(count, texts, user_ids, now, rnd):
+    """
+    Комментарии тяготеют к свежим постам: номер поста с конца
+    выбирается по распределению Парето. Комментарий появляется
+    в среднем через сутки после поста, но не в будущем.
+    """
+    recent = list(Post.objects.order_by('-pub_date').values_list(
+        'pk', 'pub_date'
+    )[:BATCH_SIZE])
+    if not recent:
+        return
+
+    def make_comment():
+        post_id, pub_date = recent[
+            min(len(recent), int(rnd.paretovariate(1.0))) - 1
+        ]
+        delay = timedelta(seconds=rnd.expovariate(1 / 86400))
+        return Comment(
+            text=rnd.choice(texts)[:200],
+            author_id=rnd.choice(user_ids),
+            post_id=post_id,
+            created=min(now, pub_date + delay),
+        )
+
+    with keep_dates(Comment._meta.get_field('created')):
+        for batch in batched(make_comment() for _ in range(count)):
+            Comment.objects.bulk_create(batch)
+
+
+def generate(posts=1000000, users=10000, groups=1000, hot_groups=10,
+             follows_per_user=20, comments=100000, image_share=0.3,
+             images=50, exponent=1.2, days=365, seed=0, log=None):
+    """
+    Наполняет базу реалистичными данными.
+
+    Авторы постов, подписки и группы выбираются по степенному закону:
+    у немногих авторов большая часть постов и подписчиков, а первые
+    hot_groups групп собирают большую часть постов.
+    Посты разбросаны по последним days дням, а комментарии
+    появляются через часы-дни после поста.
+    После загрузки в обход сигналов пересобираются ленты, счётчики
+    и поисковый индекс.
+    """
+    log = log or (lambda message: None)
+    rnd = random.Random(seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(seed)
+
+    log('Пользователи: {}'.format(users))
+    start = User.objects.count()
+    for batch in batched(
+        User(username='{}{}'.format(USERNAME_PREFIX, start + number),
+             first_name=fake.first_name(),
+             last_name=fake.last_name(),
+             password='!')
+        for number in range(users)
+    ):
+        User.objects.bulk_create(batch)
+    user_ids = list(
+        User.objects.filter(username__startswith=USERNAME_PREFIX)
+        .order_by('pk').values_list('pk', flat=True)
+    )
+
+    log('Группы: {}'.format(groups))
+    mixer.cycle(groups).blend(
+        Group,
+        title=lambda: fake.sentence(nb_words=3)[:200],
+        description=lambda: fake.paragraph(),
+    )
+    group_ids = list(Group.objects.order_by('pk').values_list(
+        'pk', flat=True
+    ))
+    group_weights = [
+        100 if number < hot_groups else 1 for number in range(len(group_ids))
+    ]
+
+    image_names = make_images(images, seed) if image_share else []
+    author_weights = list(itertools.accumulate(
+        zipf_weights(len(user_ids), exponent)
+    ))
+
+    log('Посты: {}'.format(posts))
+    texts = [fake.paragraph(nb_sentences=5) for _ in range(1000)]
+    now = timezone.now()
+    span = timedelta(days=days).total_seconds()
+
+    def make_post():
+        has_group = rnd.random() < 0.7
+        has_image = rnd.random() < image_share
+        return Post(
+            text=rnd.choice(texts),
+            author_id=rnd.choices(user_ids, cum_weights=author_weights)[0],
+            group_id=rnd.choices(group_ids, weights=group_weights)[0]
+            if has_group and group_ids else None,
+            image=rnd.choice(image_names) if has_image else '',
+            pub_date=now - timedelta(seconds=rnd.uniform(0, span)),
+        )
+
+    with keep_dates(Post._meta.get_field('pub_date')):
+        for batch in batched(make_post() for _ in range(posts)):
+            Post.objects.bulk_create(batch)
+
+    log('Подписки: ~{} на пользователя'.format(follows_per_user))
+    follows = set()
+    for user_id in user_ids:
+        for author_id in rnd.choices(
+            user_ids, cum_weights=author_weights,
+            k=rnd.randint(0, 2 * follows_per_user)
+        ):
+            if author_id != user_id:
+                follows.add((user_id, author_id))
+    for batch in batched(
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in follows
+    ):
+        Follow.objects.bulk_create(batch)
+
+    log('Комментарии: {}'.format(comments))
+    generate_comments(comments, texts, user_ids, now, rnd)
+
+    log('Ленты, счётчики и поисковый индекс')
+    recount_all()
+    rebuild_feeds()
+    get_search_backend().rebuild()
+
+
+def benchmark_targets():
+    """
+    Страницы для замера: самая большая группа, самый активный автор,
+    самый комментируемый пост и самый подписанный пользователь.
+    """
+    group = Group.objects.annotate(
+        total=Count('posts')
+    ).order_by('-total').first()
+    author = User.objects.order_by('-stats__posts_count').first()
+    post = Post.objects.order_by('-comments_count', '-pk').first()
+    reader = User.objects.order_by('-stats__following_count').first()
+    targets = {'posts:index': (reverse('posts:index'), None)}
+    if group is not None:
+        targets['posts:group_list'] = (
+            reverse('posts:group_list', kwargs={'slug': group.slug}), None
+        )
+    if author is not None:
+        targets['posts:profile'] = (
+            reverse('posts:profile', kwargs={'username': author.username}),
+            None
+        )
+    if post is not None:
+        targets['posts:post_detail'] = (
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}), None
+        )
+    if reader is not None:
+        targets['posts:follow_index'] = (
+            reverse('posts:follow_index'), reader
+        )
+    return targets
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def fetch(client, target):
+    """Запрашивает страницу и читает тело, в том числе потоковое."""
+    response = client.get(target)
+    if response.streaming:
+        content = b''.join(response.streaming_content)
+    else:
+        content = response.content
+    assert response.status_code == 200, (target, response)
+    # Панель отладки раздувает страницу в десятки раз.
+    assert b'djDebug' not in content, (target, 'debug toolbar')
+    return content
+
+
+@override_settings(DEBUG=False)
+def measure(url, user=None, iterations=50, warmup=5, cold=False,
+            query=''):
+    """
+    Замеряет задержку, число SQL-запросов и пик памяти страницы.
+    Замер идёт без DEBUG, как в боевом режиме: иначе в страницы
+    встраивается панель отладки.
+    """
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    target = url + query
+    for _ in range(warmup):
+        fetch(client, target)
+    latencies = []
+    queries = []
+    tracemalloc.start()
+    try:
+        for _ in range(iterations):
+            if cold:
+                cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                fetch(client, target)
+                latencies.append(time.perf_counter() - start)
+            queries.append(len(captured))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'url': target,
+        'iterations': iterations,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p90_ms': percentile(latencies, 0.9) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'queries_per_request': statistics.mean(queries),
+        'peak_memory_kb': peak / 1024,
+    }
+
+
+def run(iterations=50, warmup=5, cold=False, deep_page=None):
+    """Замеряет все страницы; deep_page добавляет замер ?page=N."""
+    results = {}
+    for name, (url, user) in benchmark_targets().items():
+        results[name] = measure(url, user, iterations, warmup, cold)
+        if deep_page and name != 'posts:post_detail':
+            results[name + '?page'] = measure(
+                url, user, iterations, warmup, cold,
+                query='?page={}'.format(deep_page)
+            )
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Сравнивает результаты с сохранёнными.
+    Возвращает список регрессий: p50 или число запросов выросли
+    больше чем на tolerance (доля).
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ('p50_ms', 'queries_per_request'):
+            if current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(
+                    '{}: {} {:.2f} -> {:.2f}'.format(
+                        name, metric, previous[metric], current[metric]
+                    )
+                )
+    return regressions
+
+
+def dump(results, path):
+    with open(path, 'w') as output:
+        json.dump(results, output, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as source:
+        return json.load(source)
+
+
+async def http_get(host, port, path, cookie=None):
+    """
+    GET по HTTP/1.1 с закрытием соединения.
+    Возвращает код ответа; тело читается до конца и отбрасывается.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        lines = [
+            'GET {} HTTP/1.1'.format(path),
+            'Host: {}:{}'.format(host, port),
+            'Connection: close',
+        ]
+        if cookie:
+            lines.append('Cookie: {}'.format(cookie))
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+        status_line = await reader.readline()
+        while await reader.read(65536):
+            pass
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def load_server(base_url, targets, concurrency, total):
+    """
+    concurrency клиентов по очереди запрашивают страницы targets,
+    пока не будет сделано total запросов.
+    """
+    address = urlsplit(base_url)
+    host, port = address.hostname, address.port or 80
+    jobs = itertools.islice(itertools.cycle(targets), total)
+    latencies = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        for path, cookie in jobs:
+            start = time.perf_counter()
+            try:
+                status = await http_get(host, port, path, cookie)
+            except OSError:
+                status = None
+            latencies.append(time.perf_counter() - start)
+            if status is None or status >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        'url': base_url,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def session_cookie(user):
+    """Cookie сессии пользователя для запросов к живому серверу."""
+    client = Client()
+    client.force_login(user)
+    return '{}={}'.format(
+        settings.SESSION_COOKIE_NAME,
+        client.cookies[settings.SESSION_COOKIE_NAME].value
+    )
+
+
+def http_targets(paths=None):
+    """Пути для нагрузки: заданные или страницы benchmark_targets."""
+    if paths:
+        return [(path, None) for path in paths]
+    return [
+        (url, session_cookie(user) if user is not None else None)
+        for url, user in benchmark_targets().values()
+    ]
+
+
+def run_http(base_urls, concurrency=200, total=5000, paths=None):
+    """Нагружает по очереди каждый сервер одними и теми же страницами."""
+    targets = http_targets(paths)
+    return {
+        base_url: asyncio.run(
+            load_server(base_url, targets, concurrency, total)
+        )
+        for base_url in base_urls
+    }
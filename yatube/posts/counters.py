@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+def count_subquery(queryset, field):
+    """Подзапрос числа строк queryset, сгруппированных по field."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(total=Count('pk')).values('total')
+        ),
+        0
+    )
+
+
+def recount_user(user_id):
+    """Точно пересчитывает счётчики пользователя и сохраняет их."""
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id
+            ).count(),
+            'following_count': Follow.objects.filter(
+                user_id=user_id
+            ).count(),
+        }
+    )
+    return stats
+
+
+def user_stats(user):
+    """Счётчики пользователя; при отсутствии строки считаются заново."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return recount_user(user.pk)
+
+
+def increment(user_id, field):
+    """Увеличивает счётчик; отсутствующая строка создаётся пересчётом."""
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        **{field: F(field) + 1}
+    )
+    if not updated:
+        recount_user(user_id)
+
+
+def decrement(user_id, field):
+    """
+    Уменьшает счётчик.
+    Строку не создаёт: при каскадном удалении пользователя
+    её уже может не быть.
+    """
+    UserStats.objects.filter(user_id=user_id, **{field + '__gt': 0}).update(
+        **{field: F(field) - 1}
+    )
+
+
+def change_comments_count(post_id, delta):
+    """Меняет счётчик и версию карточки поста, где он выводится."""
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gt=0)
+    posts.update(
+        comments_count=F('comments_count') + delta,
+        version=F('version') + 1,
+    )
+
+
+def recount_all():
+    """Пересчитывает все счётчики пакетными UPDATE."""
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=user_id) for user_id in User.objects.exclude(
+            stats__isnull=False
+        ).values_list('pk', flat=True).iterator()),
+        batch_size=500,
+    )
+    UserStats.objects.update(
+        posts_count=count_subquery(Post.objects.all(), 'author'),
+        followers_count=count_subquery(Follow.objects.all(), 'author'),
+        following_count=count_subquery(Follow.objects.all(), 'user'),
+    )
+    Post.objects.update(
+        comments_count=count_subquery(Comment.objects.all(), 'post'),
+        version=F('version') + 1,
+    )
@@ -0,0 +1,150 @@
+from django.conf import settings
+from django.db.models import F, FilteredRelation, Q
+
+from .models import FeedEntry, Follow, Post, UserStats
+
+BATCH_SIZE = 500
+
+
+def fanout_limit():
+    return getattr(settings, 'FEED_FANOUT_LIMIT', 1000)
+
+
+def is_heavy_author(author):
+    """
+    Автор с большим числом подписчиков.
+    Его посты не раскладываются по лентам, а читаются при запросе.
+    """
+    return UserStats.objects.filter(user=author, direct_feed=True).exists()
+
+
+def heavy_author_ids(user):
+    """id «тяжёлых» авторов, на которых подписан пользователь."""
+    return Follow.objects.filter(
+        user=user, author__stats__direct_feed=True
+    ).values_list('author', flat=True)
+
+
+def update_direct_feed(author):
+    """
+    Переводит автора на чтение при запросе, когда подписчиков
+    стало FEED_FANOUT_LIMIT. Обратно его переводит backfill_feeds.
+    """
+    UserStats.objects.filter(
+        user=author, direct_feed=False, followers_count__gte=fanout_limit()
+    ).update(direct_feed=True)
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_heavy_author(post.author):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def fill_feed(user_id, author_id):
+    """Добавляет в ленту user_id ещё не разложенные посты автора."""
+    posts = Post.objects.filter(author_id=author_id).exclude(
+        feed_entries__user_id=user_id
+    ).values_list('pk', 'pub_date')
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts.iterator()),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def backfill_feed(user, author):
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if not is_heavy_author(author):
+        fill_feed(user.pk, author.pk)
+
+
+def trim_feed(user, author):
+    """Убирает из ленты отписавшегося пользователя посты автора."""
+    FeedEntry.objects.filter(user=user, post__author=author).delete()
+
+
+def backfill_direct_feeds():
+    """
+    Возвращает к раскладке авторов, у которых подписчиков снова
+    меньше FEED_FANOUT_LIMIT: дозаполняет ленты их подписчиков
+    и снимает флаг. Пока флаг стоит, посты автора читаются
+    при запросе, поэтому ленты остаются полными.
+    Возвращает число таких авторов.
+    """
+    authors = UserStats.objects.filter(
+        direct_feed=True, followers_count__lt=fanout_limit()
+    ).values_list('user_id', flat=True)
+    count = 0
+    for author_id in authors:
+        followers = Follow.objects.filter(author_id=author_id).values_list(
+            'user_id', flat=True
+        )
+        for user_id in followers:
+            fill_feed(user_id, author_id)
+        UserStats.objects.filter(user_id=author_id).update(direct_feed=False)
+        # Посты, опубликованные во время дозаполнения, ещё не разложены.
+        for user_id in followers:
+            fill_feed(user_id, author_id)
+        count += 1
+    return count
+
+
+def feed_posts(user):
+    """
+    Посты ленты подписок, от новых к старым.
+    Обычно это диапазонное чтение материализованной ленты по индексу
+    (user, -pub_date, -post). Посты «тяжёлых» авторов, на которых
+    подписан пользователь, добавляются к ней при запросе.
+    """
+    heavy = list(heavy_author_ids(user))
+    if heavy:
+        entries = FeedEntry.objects.filter(user=user).values('post')
+        return Post.objects.filter(
+            Q(pk__in=entries) | Q(author__in=heavy)
+        )
+    # Ключ страницы — аннотации: фильтр курсора по ним не добавляет
+    # второго соединения с лентой, как фильтр по entry__pub_date.
+    return Post.objects.annotate(
+        entry=FilteredRelation(
+            'feed_entries', condition=Q(feed_entries__user=user)
+        )
+    ).filter(entry__isnull=False).annotate(
+        feed_date=F('entry__pub_date'), feed_post=F('entry__post__id')
+    ).order_by('-feed_date', '-feed_post')
+
+
+def rebuild_feeds():
+    """
+    Перестраивает все ленты подписок по таблице Follow.
+    Нужна после массовой загрузки данных в обход сигналов;
+    «тяжёлых» авторов определяет по уже пересчитанным
+    счётчикам подписчиков.
+    """
+    FeedEntry.objects.all().delete()
+    UserStats.objects.update(direct_feed=False)
+    UserStats.objects.filter(
+        followers_count__gte=fanout_limit()
+    ).update(direct_feed=True)
+    follows = list(
+        Follow.objects.exclude(
+            author__stats__direct_feed=True
+        ).values_list('user_id', 'author_id')
+    )
+    for user_id, author_id in follows:
+        posts = Post.objects.filter(author_id=author_id).values_list(
+            'pk', 'pub_date'
+        )
+        FeedEntry.objects.bulk_create(
+            (FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+             for post_id, pub_date in posts.iterator()),
+            batch_size=BATCH_SIZE,
+        )
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from .models import Post, Comment
+from .images import process_upload
 
 
 class PostForm(forms.ModelForm):
@@ -10,6 +12,13 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('group', 'text', 'image')
 
+    def clean_image(self):
+        """Новая картинка уменьшается, перекодируется и дедуплицируется."""
+        image = self.cleaned_data.get('image')
+        if isinstance(image, UploadedFile):
+            return process_upload(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     """
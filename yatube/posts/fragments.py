@@ -0,0 +1,50 @@
+from django.db.models import F
+
+from core.conditional import bump_version
+
+from .models import Post
+
+POST_CARD_FRAGMENT = 'post_card'
+
+# Ключи версий содержимого для условных ответов страниц.
+# SITE_VERSION меняется редко и сразу для всех страниц: при правке
+# группы или переносе картинок. POSTS_VERSION — любой пост сайта.
+SITE_VERSION = 'site'
+POSTS_VERSION = 'posts'
+
+
+def user_version(username):
+    return 'user:{}'.format(username)
+
+
+def group_version(slug):
+    return 'group:{}'.format(slug)
+
+
+def post_version(post_id):
+    return 'post:{}'.format(post_id)
+
+
+def post_versions(post_id, username, group_slug=None):
+    """Ключи версий страниц, на которых виден пост."""
+    keys = [POSTS_VERSION, post_version(post_id), user_version(username)]
+    if group_slug:
+        keys.append(group_version(group_slug))
+    return keys
+
+
+def bump_post_versions(post_id):
+    """Меняет версии страниц поста, сохранённого в базе."""
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    if row is not None:
+        bump_version(*post_versions(post_id, *row))
+
+
+def invalidate_post_card(post_id):
+    """
+    Меняет версию карточки поста. Версия входит в ключ кэша,
+    поэтому старая карточка устаревает во всех процессах сразу.
+    """
+    Post.objects.filter(pk=post_id).update(version=F('version') + 1)
@@ -0,0 +1,186 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps, features
+
+from core.conditional import bump_version
+
+from .fragments import SITE_VERSION
+from .models import Post
+
+FORMAT_EXTENSIONS = {
+    'WEBP': 'webp',
+    'JPEG': 'jpg',
+}
+
+
+def image_format():
+    """Формат хранения картинок; WebP — если Pillow его поддерживает."""
+    if settings.POST_IMAGE_FORMAT == 'WEBP' and not features.check('webp'):
+        return 'JPEG'
+    return settings.POST_IMAGE_FORMAT
+
+
+def content_hash(upload):
+    """SHA-256 содержимого файла, прочитанного по частям."""
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def normalize_image(upload):
+    """
+    Уменьшает картинку до POST_IMAGE_MAX_SIDE по большей стороне
+    и перекодирует её без EXIF.
+
+    Для JPEG декодер сразу читает уменьшенную копию (Image.draft),
+    поэтому полноразмерная картинка в память не распаковывается.
+    """
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    fmt = image_format()
+    upload.seek(0)
+    with Image.open(upload) as image:
+        image.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side))
+        has_alpha = image.mode in ('RGBA', 'LA') or (
+            image.mode == 'P' and 'transparency' in image.info
+        )
+        if has_alpha and fmt == 'WEBP':
+            image = image.convert('RGBA')
+        else:
+            image = image.convert('RGB')
+        output = BytesIO()
+        image.save(
+            output,
+            format=fmt,
+            quality=settings.POST_IMAGE_QUALITY,
+            optimize=True,
+        )
+    return output.getvalue()
+
+
+def process_upload(upload):
+    """
+    Готовит загруженную картинку к сохранению в Post.image.
+
+    Возвращает имя уже сохранённого файла с тем же содержимым
+    или ContentFile с перекодированной картинкой, названной по хешу
+    исходного файла.
+    """
+    if upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Размер картинки не должен превышать %(size)s.',
+            code='file_too_large',
+            params={
+                'size': filesizeformat(settings.POST_IMAGE_MAX_UPLOAD_SIZE)
+            },
+        )
+    name = '{}.{}'.format(content_hash(upload), FORMAT_EXTENSIONS[
+        image_format()
+    ])
+    stored_name = default_storage.generate_filename(
+        os.path.join('posts', name)
+    )
+    if default_storage.exists(stored_name):
+        return stored_name
+    try:
+        content = normalize_image(upload)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Не удалось обработать картинку.', code='invalid_image'
+        )
+    return ContentFile(content, name=name)
+
+
+def move_image(storage, old_name, new_name):
+    """
+    Кладёт файл под новое имя, не удаляя старый: старое имя
+    нужно постам, пока их строки не обновлены. На диске это жёсткая
+    ссылка, в остальных хранилищах — копия. Возвращает False,
+    если файла нет ни под одним из имён.
+    """
+    if storage.exists(new_name):
+        return True
+    if not storage.exists(old_name):
+        return False
+    try:
+        old_path, new_path = storage.path(old_name), storage.path(new_name)
+    except NotImplementedError:
+        with storage.open(old_name) as file:
+            storage.save(new_name, file)
+    else:
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        try:
+            os.link(old_path, new_path)
+        except FileExistsError:
+            pass
+    return True
+
+
+def shard_post_images(batch_size=500, workers=8, storage=None, log=None):
+    """
+    Переносит картинки постов в подкаталоги хранилища.
+
+    Посты обходятся пачками по pk. Для пачки файлы параллельно
+    переносятся под новые имена, затем в одной транзакции
+    обновляется Post.image, и только после этого удаляются старые
+    файлы. Прерванный перенос можно запустить снова: уже перенесённые
+    файлы и посты пропускаются. Возвращает (постов, файлов, пропущено).
+    """
+    storage = storage or default_storage
+    posts = files = missing = 0
+    last_pk = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = list(
+                Post.objects.exclude(image='').filter(pk__gt=last_pk)
+                .order_by('pk').values_list('pk', 'image')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            renames = {
+                name: storage.generate_filename(name)
+                for _, name in batch
+            }
+            renames = {
+                old: new for old, new in renames.items() if old != new
+            }
+            moved = dict(zip(renames, pool.map(
+                lambda item: move_image(storage, *item), renames.items()
+            )))
+            updated = [
+                Post(pk=pk, image=renames[name])
+                for pk, name in batch if moved.get(name)
+            ]
+            with transaction.atomic():
+                Post.objects.bulk_update(updated, ['image'])
+            # Одна картинка бывает у нескольких постов из разных пачек.
+            moved_names = [old for old in renames if moved[old]]
+            still_used = set(Post.objects.filter(
+                image__in=moved_names
+            ).values_list('image', flat=True))
+            list(pool.map(storage.delete, [
+                old for old in moved_names if old not in still_used
+            ]))
+            posts += len(updated)
+            files += sum(moved.values())
+            missing += len(moved) - sum(moved.values())
+            if log:
+                log('Постов: {}, файлов: {}, без файла: {}'.format(
+                    posts, files, missing
+                ))
+    # Страницы со старыми адресами картинок больше не актуальны.
+    bump_version(SITE_VERSION)
+    return posts, files, missing
@@ -0,0 +1,143 @@
+"""
+Хранилище метаданных sorl-thumbnail в отдельном файле SQLite.
+
+Файл общий для всех процессов и переживает перезапуск, а читается
+через mmap. Поверх него в каждом процессе лежит ограниченный
+словарь найденных записей: миниатюра, однажды записанная, уже
+не меняется, поэтому горячие карточки не обращаются даже к SQLite.
+Отсутствующие записи в памяти не запоминаются — миниатюру мог
+только что создать другой процесс.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connections
+from sorl.thumbnail.images import deserialize_image_file
+from sorl.thumbnail.kvstores.base import KVStoreBase, add_prefix
+
+IN_MEMORY_PATH = 'file:yatube_thumbnails?mode=memory&cache=shared'
+# Ограничение SQLite на число параметров запроса.
+MAX_VARIABLES = 900
+
+
+def store_path():
+    """
+    THUMBNAIL_KVSTORE_PATH или файл рядом с основной базой.
+    Для базы в памяти (например, в тестах) хранилище тоже в памяти.
+    """
+    if settings.THUMBNAIL_KVSTORE_PATH:
+        return settings.THUMBNAIL_KVSTORE_PATH
+    connection = connections['default']
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        return IN_MEMORY_PATH
+    return os.path.join(settings.BASE_DIR, 'thumbnails.sqlite3')
+
+
+class SqliteKVStore(KVStoreBase):
+    def __init__(self):
+        super().__init__()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.path = None
+        self.memory = OrderedDict()
+
+    @property
+    def connection(self):
+        path = store_path()
+        with self.lock:
+            if path != self.path:
+                # Другое хранилище: записи в памяти к нему не относятся.
+                self.path = path
+                self.memory.clear()
+        opened = getattr(self.local, 'connections', None)
+        if opened is None:
+            opened = self.local.connections = {}
+        # Соединение SQLite нельзя использовать после fork.
+        key = (os.getpid(), path)
+        if key not in opened:
+            opened[key] = self.connect(path)
+        return opened[key]
+
+    def connect(self, path):
+        connection = sqlite3.connect(
+            path, timeout=5, isolation_level=None,
+            uri=path.startswith('file:'),
+        )
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            connection.execute(
+                'PRAGMA {} = {}'.format(name, value)
+            ).fetchall()
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS kvstore '
+            '(key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID'
+        )
+        return connection
+
+    def remember(self, items):
+        with self.lock:
+            for key, value in items:
+                self.memory[key] = value
+                self.memory.move_to_end(key)
+            while len(self.memory) > settings.THUMBNAIL_KVSTORE_MEMORY_SIZE:
+                self.memory.popitem(last=False)
+
+    def get_many(self, image_files):
+        """
+        ImageFile из хранилища (или None) для каждого из image_files;
+        всё, чего нет в памяти, читается одним запросом.
+        """
+        keys = [add_prefix(image_file.key) for image_file in image_files]
+        values = self._get_many_raw(keys)
+        return [
+            deserialize_image_file(values[key]) if key in values else None
+            for key in keys
+        ]
+
+    def _get_many_raw(self, keys):
+        values = {}
+        with self.lock:
+            for key in keys:
+                if key in self.memory:
+                    values[key] = self.memory[key]
+        missing = [key for key in keys if key not in values]
+        found = []
+        for start in range(0, len(missing), MAX_VARIABLES):
+            part = missing[start:start + MAX_VARIABLES]
+            found += self.connection.execute(
+                'SELECT key, value FROM kvstore WHERE key IN ({})'.format(
+                    ', '.join('?' * len(part))
+                ),
+                part,
+            ).fetchall()
+        self.remember(found)
+        values.update(found)
+        return values
+
+    def _get_raw(self, key):
+        return self._get_many_raw([key]).get(key)
+
+    def _set_raw(self, key, value):
+        self.connection.execute(
+            'INSERT OR REPLACE INTO kvstore (key, value) VALUES (?, ?)',
+            (key, value),
+        )
+        self.remember([(key, value)])
+
+    def _delete_raw(self, *keys):
+        self.connection.executemany(
+            'DELETE FROM kvstore WHERE key = ?', [(key,) for key in keys]
+        )
+        with self.lock:
+            for key in keys:
+                self.memory.pop(key, None)
+
+    def _find_keys_raw(self, prefix):
+        return [
+            key for key, in self.connection.execute(
+                'SELECT key FROM kvstore WHERE substr(key, 1, ?) = ?',
+                (len(prefix), prefix),
+            )
+        ]
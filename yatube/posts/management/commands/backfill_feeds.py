@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.feed import backfill_direct_feeds
+
+
+class Command(BaseCommand):
+    help = ('Возвращает к раскладке по лентам авторов, у которых '
+            'стало меньше FEED_FANOUT_LIMIT подписчиков.')
+
+    def handle(self, *args, **options):
+        count = backfill_direct_feeds()
+        self.stdout.write(self.style.SUCCESS(
+            'Ленты дозаполнены для авторов: {}.'.format(count)
+        ))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Наполняет базу данными для замеров производительности.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=1000)
+        parser.add_argument(
+            '--hot-groups', type=int, default=10,
+            help='Сколько групп собирают большую часть постов.',
+        )
+        parser.add_argument(
+            '--follows-per-user', type=int, default=20,
+            help='Среднее число подписок пользователя.',
+        )
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument(
+            '--image-share', type=float, default=0.3,
+            help='Доля постов с картинкой.',
+        )
+        parser.add_argument(
+            '--images', type=int, default=50,
+            help='Сколько разных картинок создать.',
+        )
+        parser.add_argument(
+            '--exponent', type=float, default=1.2,
+            help='Показатель степенного распределения авторов.',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней распределить посты.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            benchmark.generate(
+                posts=options['posts'],
+                users=options['users'],
+                groups=options['groups'],
+                hot_groups=options['hot_groups'],
+                follows_per_user=options['follows_per_user'],
+                comments=options['comments'],
+                image_share=options['image_share'],
+                images=options['images'],
+                exponent=options['exponent'],
+                days=options['days'],
+                seed=options['seed'],
+                log=self.stdout.write,
+            )
+        self.stdout.write(self.style.SUCCESS('Данные созданы'))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает запущенные серверы страницами постов и сравнивает '
+        'пропускную способность и p99. Например, WSGI и ASGI:\n'
+        '  gunicorn yatube.wsgi --threads 8 -b 127.0.0.1:8000\n'
+        '  uvicorn yatube.asgi:application --port 8001\n'
+        '  manage.py benchmark_http http://127.0.0.1:8000 '
+        'http://127.0.0.1:8001'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='Адреса серверов.')
+        parser.add_argument('--concurrency', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Путь для нагрузки; по умолчанию — страницы '
+                 'benchmark_views.',
+        )
+        parser.add_argument(
+            '--output', help='Куда записать результаты в JSON.',
+        )
+
+    def handle(self, *args, **options):
+        results = benchmark.run_http(
+            options['urls'],
+            concurrency=options['concurrency'],
+            total=options['requests'],
+            paths=options['paths'],
+        )
+        for result in results.values():
+            self.stdout.write(
+                '{url:<28} {throughput_rps:9.1f} rps  '
+                'p50 {p50_ms:8.2f} ms  p99 {p99_ms:8.2f} ms  '
+                'errors {errors}'.format(**result)
+            )
+        if options['output']:
+            benchmark.dump(results, options['output'])
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку, число SQL-запросов и пик памяти '
+        'страниц постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.',
+        )
+        parser.add_argument(
+            '--deep-page', type=int, default=None,
+            help='Дополнительно замерить страницу ?page=N.',
+        )
+        parser.add_argument(
+            '--output', help='Куда записать результаты в JSON.',
+        )
+        parser.add_argument(
+            '--baseline', help='JSON с результатами для сравнения.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост p50 и числа запросов (доля).',
+        )
+
+    def handle(self, *args, **options):
+        results = benchmark.run(
+            iterations=options['iterations'],
+            warmup=options['warmup'],
+            cold=options['cold'],
+            deep_page=options['deep_page'],
+        )
+        for name, result in sorted(results.items()):
+            self.stdout.write(
+                '{:<24} p50 {p50_ms:8.2f} ms  p90 {p90_ms:8.2f} ms  '
+                'p99 {p99_ms:8.2f} ms  queries {queries_per_request:5.1f}  '
+                'memory {peak_memory_kb:8.1f} KB'.format(name, **result)
+            )
+        if options['output']:
+            benchmark.dump(results, options['output'])
+        if options['baseline']:
+            regressions = benchmark.compare(
+                results, benchmark.load(options['baseline']),
+                options['tolerance'],
+            )
+            if regressions:
+                raise CommandError(
+                    'Регрессии:\n' + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,91 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts.feed import feed_posts
+from posts.models import Comment, Group, Post
+from posts.utils import (
+    KeysetPaginator, comments_queryset, encode_comment_cursor, encode_cursor
+)
+from posts.views import (
+    QUANTITY_OF_COMMENTS_ON_PAGE, QUANTITY_OF_POSTS_ON_PAGE
+)
+
+User = get_user_model()
+
+# Строка плана SQLite без индекса: «SCAN posts_post» или
+# «SCAN TABLE posts_post» — полный проход по таблице.
+FULL_SCAN = re.compile(r'SCAN (TABLE )?\w+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+class Command(BaseCommand):
+    help = 'Выводит EXPLAIN QUERY PLAN для запросов лент.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Завершиться с ошибкой, если есть полный проход '
+                 'по таблице.',
+        )
+
+    def querysets(self):
+        """
+        Те же запросы, что выполняют view: первая страница
+        и страница после курсора.
+        """
+        now = timezone.now()
+        user = User.objects.first() or User(pk=1)
+        group = Group.objects.first() or Group(pk=1)
+        post = Post.objects.first() or Post(pk=1, pub_date=now)
+        comment = Comment.objects.first() or Comment(pk=1, created=now)
+        feeds = {
+            'posts:index': Post.objects.select_related('author', 'group'),
+            'posts:group_list': group.posts.select_related(
+                'author', 'group'
+            ),
+            'posts:profile': user.posts.select_related('author', 'group'),
+            'posts:follow_index': feed_posts(user).select_related(
+                'author', 'group'
+            ),
+        }
+        querysets = {}
+        for name, posts in feeds.items():
+            paginator = KeysetPaginator(posts, QUANTITY_OF_POSTS_ON_PAGE)
+            querysets[name] = paginator.page_queryset(None)[0]
+            querysets[name + ' (cursor)'] = paginator.page_queryset(
+                encode_cursor(post)
+            )[0]
+        comments = post.comments.select_related('author')
+        querysets['posts:post_detail (comments)'] = comments_queryset(
+            comments, None, QUANTITY_OF_COMMENTS_ON_PAGE
+        )
+        querysets['posts:post_detail (comments, cursor)'] = comments_queryset(
+            comments, encode_comment_cursor(comment),
+            QUANTITY_OF_COMMENTS_ON_PAGE
+        )
+        return querysets
+
+    def handle(self, *args, **options):
+        problems = []
+        for name, queryset in self.querysets().items():
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for line in plan.splitlines():
+                if FULL_SCAN.search(line):
+                    problems.append(name)
+                    self.stdout.write(self.style.ERROR(line))
+                elif TEMP_SORT in line:
+                    self.stdout.write(self.style.WARNING(line))
+                else:
+                    self.stdout.write(line)
+            self.stdout.write('')
+        if problems and options['check']:
+            raise CommandError(
+                'Полный проход по таблице: {}'.format(
+                    ', '.join(sorted(set(problems)))
+                )
+            )
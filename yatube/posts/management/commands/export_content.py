@@ -0,0 +1,49 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Потоково выгружает группы, посты, комментарии и подписки '
+            'в файлы NDJSON или CSV.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог для файлов.')
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS, default='ndjson',
+        )
+        parser.add_argument(
+            '--models', nargs='+', choices=list(transfer.SPECS),
+            default=list(transfer.SPECS),
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Число процессов; каждый пишет свою часть файла.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=transfer.BATCH_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        os.makedirs(options['directory'], exist_ok=True)
+        tasks = transfer.export_tasks(
+            options['directory'], options['format'], options['models'],
+            options['workers'], options['batch_size'],
+        )
+        if options['workers'] > 1:
+            # Дочерние процессы не должны наследовать открытое соединение.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+                counts = list(pool.map(transfer.export_part, tasks))
+        else:
+            counts = [transfer.export_range(*task) for task in tasks]
+        totals = {}
+        for task, count in zip(tasks, counts):
+            totals[task[0]] = totals.get(task[0], 0) + count
+        for name, total in totals.items():
+            self.stdout.write('{}: {}'.format(name, total))
+        self.stdout.write(self.style.SUCCESS('Выгрузка завершена.'))
@@ -0,0 +1,52 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import generate_post_thumbnail
+
+
+def generate_batch(image_names):
+    """Создаёт миниатюры пачки картинок в дочернем процессе."""
+    done = sum(
+        generate_post_thumbnail(name) is not None for name in image_names
+    )
+    connections.close_all()
+    return done
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры для всех картинок постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Число процессов; по умолчанию — число ядер.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='Сколько картинок обрабатывает процесс за одно задание.',
+        )
+
+    def handle(self, *args, **options):
+        image_names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct()
+        batch_size = options['batch_size']
+        batches = []
+        batch = []
+        for name in image_names.iterator():
+            batch.append(name)
+            if len(batch) == batch_size:
+                batches.append(batch)
+                batch = []
+        if batch:
+            batches.append(batch)
+        # Дочерние процессы не должны наследовать открытое соединение.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            done = sum(pool.map(generate_batch, batches))
+        self.stdout.write(self.style.SUCCESS(
+            'Обработано картинок: {}'.format(done)
+        ))
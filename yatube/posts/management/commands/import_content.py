@@ -0,0 +1,61 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Потоково загружает группы, посты, комментарии и подписки '
+            'из файлов NDJSON или CSV.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Каталог с файлами.')
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS, default='ndjson',
+        )
+        parser.add_argument(
+            '--models', nargs='+', choices=list(transfer.SPECS),
+            default=list(transfer.SPECS),
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Число процессов; части одной модели загружаются '
+                 'параллельно. SQLite всё равно пишет по очереди.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=transfer.BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--skip-rebuild', action='store_true',
+            help='Не пересобирать ленты, счётчики и поисковый индекс.',
+        )
+
+    def handle(self, *args, **options):
+        fmt = options['format']
+        names = [name for name in transfer.SPECS if name in options['models']]
+        found = False
+        for name in names:
+            tasks = [
+                (name, path, fmt, options['batch_size'])
+                for path in transfer.part_paths(
+                    options['directory'], name, fmt
+                )
+            ]
+            found = found or bool(tasks)
+            if options['workers'] > 1 and len(tasks) > 1:
+                connections.close_all()
+                with ProcessPoolExecutor(
+                    max_workers=options['workers']
+                ) as pool:
+                    total = sum(pool.map(transfer.import_part, tasks))
+            else:
+                total = sum(transfer.import_file(*task) for task in tasks)
+            self.stdout.write('{}: {}'.format(name, total))
+        if not found:
+            raise CommandError('В каталоге нет файлов {}.'.format(fmt))
+        transfer.reset_sequences(names)
+        if not options['skip_rebuild']:
+            transfer.rebuild_derived()
+        self.stdout.write(self.style.SUCCESS('Загрузка завершена.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс постов.'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            'Индекс перестроен: {}'.format(type(backend).__name__)
+        ))
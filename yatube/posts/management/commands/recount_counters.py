@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount_all
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает денормализованные счётчики постов, '
+            'комментариев и подписок.')
+
+    def handle(self, *args, **options):
+        recount_all()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from posts.images import shard_post_images
+
+
+class Command(BaseCommand):
+    help = 'Переносит картинки постов в подкаталоги по хэшу имени.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько постов обновляется в одной транзакции.',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='Сколько файлов переносится одновременно.',
+        )
+
+    def handle(self, *args, **options):
+        posts, files, missing = shard_post_images(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Перенесено файлов: {}, обновлено постов: {}'.format(
+                files, posts
+            )
+        ))
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                'Файлов не найдено: {}'.format(missing)
+            ))
+        if posts:
+            self.stdout.write(
+                'Миниатюры для новых имён создаст generate_thumbnails.'
+            )
@@ -0,0 +1,58 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fts5_available(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return 'ENABLE_FTS5' in {row[0] for row in cursor.fetchall()}
+
+
+def create_fts_table(apps, schema_editor):
+    if not fts5_available(schema_editor.connection):
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE posts_post_fts USING fts5('
+        'text, tokenize="unicode61")'
+    )
+    schema_editor.execute(
+        'INSERT INTO posts_post_fts(rowid, text) '
+        'SELECT id, text FROM posts_post'
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if fts5_available(schema_editor.connection):
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=100, verbose_name='Слово')),
+                ('weight', models.PositiveIntegerField(default=1, verbose_name='Число вхождений')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='posts.Post', verbose_name='Публикация')),
+            ],
+            options={
+                'verbose_name': 'Слово поискового индекса',
+                'verbose_name_plural': 'Поисковый индекс',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchtoken',
+            constraint=models.UniqueConstraint(fields=('token', 'post'), name='unique_search_token'),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.16 on 2026-10-18 19:05
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_pub_dates(apps, schema_editor):
+    FeedEntry = apps.get_model('posts', 'FeedEntry')
+    Post = apps.get_model('posts', 'Post')
+    FeedEntry.objects.update(pub_date=Subquery(
+        Post.objects.filter(pk=OuterRef('post')).values('pub_date')
+    ))
+
+
+def mark_direct_feeds(apps, schema_editor):
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gte=getattr(settings, 'FEED_FANOUT_LIMIT', 1000)
+    ).update(direct_feed=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedentry',
+            name='pub_date',
+            field=models.DateTimeField(null=True, verbose_name='Дата публикации'),
+        ),
+        migrations.RunPython(copy_pub_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='feedentry',
+            name='pub_date',
+            field=models.DateTimeField(verbose_name='Дата публикации'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='feed_user_pub_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='direct_feed',
+            field=models.BooleanField(default=False, verbose_name='Лента читается напрямую'),
+        ),
+        migrations.RunPython(mark_direct_feeds, migrations.RunPython.noop),
+    ]
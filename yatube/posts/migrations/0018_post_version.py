@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_feed_entry_pub_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия карточки'),
+        ),
+    ]
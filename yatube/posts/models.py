@@ -58,11 +58,54 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
+    )
+    # Растёт при каждом изменении, видном на карточке поста, и входит
+    # в ключ её кэша: устаревшую карточку не прочитает ни один процесс.
+    version = models.PositiveIntegerField(
+        'Версия карточки',
+        default=0,
+        editable=False
+    )
+
+    # Поля, которые меняются только атомарным UPDATE с F():
+    # правка поста не должна откатывать их параллельное изменение.
+    UPDATE_ONLY_FIELDS = ('comments_count', 'version')
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
         verbose_name = 'Публикация'
         verbose_name_plural = 'Публикации'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Обновление поста не перезаписывает UPDATE_ONLY_FIELDS
+        значениями, прочитанными в начале запроса.
+        """
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.UPDATE_ONLY_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return '{text}, {date:%Y-%m-%d}, {author}, {group}'.format(
@@ -101,6 +144,11 @@ class Comment(models.Model):
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text
@@ -128,6 +176,11 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'], name='unique_follow'
@@ -139,3 +192,108 @@ class Follow(models.Model):
             author=self.author.username,
             user=self.user.username
         )
+
+
+class FeedEntry(models.Model):
+    """
+    Запись ленты подписок.
+    Материализованная лента: пост автора раскладывается
+    подписчикам в момент публикации.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Публикация',
+    )
+    # Копия Post.pub_date: страница ленты читается по индексу
+    # (user, -pub_date, -post) без соединения с постами.
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return '{user}, {post}'.format(
+            user=self.user_id,
+            post=self.post_id
+        )
+
+
+class UserStats(models.Model):
+    """
+    Денормализованные счётчики пользователя.
+    Поддерживаются сигналами, пересчитываются командой recount_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Число подписок', default=0
+    )
+    # Посты не раскладываются по лентам, а читаются при запросе.
+    # Включается, когда подписчиков становится FEED_FANOUT_LIMIT,
+    # выключается командой backfill_feeds после дозаполнения лент.
+    direct_feed = models.BooleanField(
+        'Лента читается напрямую', default=False
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class SearchToken(models.Model):
+    """
+    Запись инвертированного индекса поиска.
+    Используется, когда база данных не поддерживает SQLite FTS5.
+    """
+    token = models.CharField('Слово', max_length=100)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='search_tokens',
+        verbose_name='Публикация',
+    )
+    weight = models.PositiveIntegerField('Число вхождений', default=1)
+
+    class Meta:
+        verbose_name = 'Слово поискового индекса'
+        verbose_name_plural = 'Поисковый индекс'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['token', 'post'], name='unique_search_token'
+            )
+        ]
+
+    def __str__(self):
+        return self.token
@@ -0,0 +1,212 @@
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q, Sum
+
+from .models import Post, SearchToken
+from .utils import pack_cursor, unpack_cursor
+
+FTS_TABLE = 'posts_post_fts'
+TOKEN_MAX_LENGTH = 100
+# Сколько постов и слов индекса обрабатывается за раз при перестройке.
+BATCH_SIZE = 500
+WORD = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Слова текста в нижнем регистре."""
+    return [word[:TOKEN_MAX_LENGTH] for word in WORD.findall(text.lower())]
+
+
+def fts5_available(conn=connection):
+    if conn.vendor != 'sqlite':
+        return False
+    with conn.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        options = {row[0] for row in cursor.fetchall()}
+    return 'ENABLE_FTS5' in options
+
+
+def create_fts_table(conn=connection):
+    """Создаёт и заполняет таблицу FTS5, если SQLite её поддерживает."""
+    if not fts5_available(conn):
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS {} USING fts5('
+            'text, tokenize="unicode61")'.format(FTS_TABLE)
+        )
+        cursor.execute('DELETE FROM {}'.format(FTS_TABLE))
+        cursor.execute(
+            'INSERT INTO {}(rowid, text) '
+            'SELECT id, text FROM posts_post'.format(FTS_TABLE)
+        )
+
+
+def post_tokens(post_id, text):
+    """Записи индекса для текста поста: слово и число его вхождений."""
+    return [
+        SearchToken(token=token, post_id=post_id, weight=weight)
+        for token, weight in Counter(tokenize(text)).items()
+    ]
+
+
+def encode_search_cursor(score, post_id):
+    return pack_cursor(repr(score), post_id)
+
+
+def decode_search_cursor(cursor):
+    parts = unpack_cursor(cursor)
+    if parts is None or len(parts) != 2:
+        return None
+    try:
+        return float(parts[0]), int(parts[1])
+    except ValueError:
+        return None
+
+
+class Fts5Backend:
+    """Поиск по виртуальной таблице SQLite FTS5 с ранжированием BM25."""
+
+    def index(self, post):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM {} WHERE rowid = %s'.format(FTS_TABLE),
+                [post.pk]
+            )
+            cursor.execute(
+                'INSERT INTO {}(rowid, text) VALUES (%s, %s)'.format(
+                    FTS_TABLE
+                ),
+                [post.pk, post.text]
+            )
+
+    def remove(self, post_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'DELETE FROM {} WHERE rowid = %s'.format(FTS_TABLE),
+                [post_id]
+            )
+
+    def rebuild(self):
+        create_fts_table()
+
+    def search(self, tokens, limit, author_id=None, group_id=None,
+               after=None):
+        match = ' '.join(
+            '"{}"'.format(token.replace('"', '""')) for token in tokens
+        )
+        where = ['{} MATCH %s'.format(FTS_TABLE)]
+        params = [match]
+        if author_id is not None:
+            where.append('post.author_id = %s')
+            params.append(author_id)
+        if group_id is not None:
+            where.append('post.group_id = %s')
+            params.append(group_id)
+        sql = (
+            'SELECT post.id AS id, -bm25({table}) AS score '
+            'FROM {table} JOIN posts_post AS post '
+            'ON post.id = {table}.rowid WHERE {where}'
+        ).format(table=FTS_TABLE, where=' AND '.join(where))
+        if after is not None:
+            sql = (
+                'SELECT id, score FROM ({}) '
+                'WHERE score < %s OR (score = %s AND id < %s)'
+            ).format(sql)
+            params.extend([after[0], after[0], after[1]])
+        sql += ' ORDER BY score DESC, id DESC LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+class InvertedIndexBackend:
+    """
+    Инвертированный индекс на обычной таблице SearchToken.
+    Ранг — сумма вхождений искомых слов в текст поста.
+    """
+
+    def index(self, post):
+        SearchToken.objects.filter(post=post).delete()
+        SearchToken.objects.bulk_create(post_tokens(post.pk, post.text))
+
+    def remove(self, post_id):
+        SearchToken.objects.filter(post_id=post_id).delete()
+
+    def rebuild(self):
+        """
+        Строит индекс заново: посты читаются пачками по BATCH_SIZE,
+        а слова каждой пачки вставляются одним bulk_create.
+        """
+        SearchToken.objects.all().delete()
+        posts = Post.objects.order_by('pk').values_list('pk', 'text')
+        batch = []
+        for post_id, text in posts.iterator(chunk_size=BATCH_SIZE):
+            batch.extend(post_tokens(post_id, text))
+            if len(batch) >= BATCH_SIZE:
+                SearchToken.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+                batch = []
+        SearchToken.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+
+    def search(self, tokens, limit, author_id=None, group_id=None,
+               after=None):
+        tokens = set(tokens)
+        matches = SearchToken.objects.filter(token__in=tokens)
+        if author_id is not None:
+            matches = matches.filter(post__author_id=author_id)
+        if group_id is not None:
+            matches = matches.filter(post__group_id=group_id)
+        matches = matches.values('post_id').annotate(
+            matched=Count('pk'), score=Sum('weight')
+        ).filter(matched=len(tokens))
+        if after is not None:
+            matches = matches.filter(
+                Q(score__lt=after[0]) | Q(score=after[0], post_id__lt=after[1])
+            )
+        return [
+            (match['post_id'], float(match['score']))
+            for match in matches.order_by('-score', '-post_id')[:limit]
+        ]
+
+
+_fts5 = None
+
+
+def get_backend():
+    global _fts5
+    name = settings.POST_SEARCH_BACKEND
+    if name == 'auto':
+        if _fts5 is None:
+            _fts5 = fts5_available()
+        name = 'fts5' if _fts5 else 'python'
+    if name == 'fts5':
+        return Fts5Backend()
+    return InvertedIndexBackend()
+
+
+def search_posts(query, limit, author_id=None, group_id=None, cursor=None):
+    """
+    Ищет посты, содержащие все слова запроса.
+    Возвращает (посты по убыванию ранга, курсор следующей страницы).
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return [], None
+    rows = get_backend().search(
+        tokens, limit + 1,
+        author_id=author_id,
+        group_id=group_id,
+        after=decode_search_cursor(cursor),
+    )
+    page = rows[:limit]
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [post_id for post_id, _ in page]
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_search_cursor(page[-1][1], page[-1][0])
+    return [posts[post_id] for post_id, _ in page], next_cursor
@@ -0,0 +1,102 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.conditional import bump_version
+
+from . import counters
+from .feed import (
+    backfill_feed, fan_out_post, trim_feed, update_direct_feed
+)
+from .fragments import (
+    SITE_VERSION, bump_post_versions, group_version, invalidate_post_card,
+    post_versions, user_version
+)
+from .search import get_backend as get_search_backend
+from .models import Comment, Follow, Group, Post
+
+
+def instance_versions(post):
+    return post_versions(
+        post.pk, post.author.username, post.group and post.group.slug
+    )
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, **kwargs):
+    """Запоминает прежнюю группу поста: её страница тоже меняется."""
+    if instance.pk is not None:
+        instance._previous_group_slug = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group__slug', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    """
+    Новый пост попадает в ленты подписчиков и в счётчик автора,
+    изменённый — сбрасывает карточку. Поисковый индекс обновляется всегда.
+    """
+    if created:
+        fan_out_post(instance)
+        counters.increment(instance.author_id, 'posts_count')
+    else:
+        invalidate_post_card(instance.pk)
+    get_search_backend().index(instance)
+    keys = instance_versions(instance)
+    previous_group = getattr(instance, '_previous_group_slug', None)
+    if previous_group:
+        keys.append(group_version(previous_group))
+    bump_version(*keys)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.decrement(instance.author_id, 'posts_count')
+    get_search_backend().remove(instance.pk)
+    bump_version(*instance_versions(instance))
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        counters.change_comments_count(instance.post_id, 1)
+        bump_post_versions(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments_count(instance.post_id, -1)
+    bump_post_versions(instance.post_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    """Новая подписка дозаполняет ленту постами автора."""
+    if created:
+        backfill_feed(instance.user, instance.author)
+        counters.increment(instance.author_id, 'followers_count')
+        counters.increment(instance.user_id, 'following_count')
+        update_direct_feed(instance.author)
+        bump_version(
+            user_version(instance.user.username),
+            user_version(instance.author.username),
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """Отписка убирает посты автора из ленты."""
+    trim_feed(instance.user, instance.author)
+    counters.decrement(instance.author_id, 'followers_count')
+    counters.decrement(instance.user_id, 'following_count')
+    bump_version(
+        user_version(instance.user.username),
+        user_version(instance.author.username),
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    """Название группы видно на карточках постов всех страниц."""
+    bump_version(SITE_VERSION, group_version(instance.slug))
@@ -0,0 +1,27 @@
+from django import template
+
+from core.templatetags.fragment_cache import skip_fragment_cache
+from posts.thumbnails import cached_post_thumbnail, schedule_post_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_thumbnail(context, post):
+    """
+    Готовая миниатюра картинки поста.
+    Картинку во время запроса не уменьшает: если миниатюры ещё нет,
+    ставит её создание в очередь и возвращает None, а карточку
+    с заглушкой не даёт закэшировать. Миниатюры, найденные
+    prefetch_post_thumbnails, повторно не ищет.
+    """
+    if not post.image:
+        return None
+    if hasattr(post, 'prefetched_thumbnail'):
+        thumbnail = post.prefetched_thumbnail
+    else:
+        thumbnail = cached_post_thumbnail(post.image)
+    if thumbnail is None:
+        skip_fragment_cache(context)
+        schedule_post_thumbnail(post)
+    return thumbnail
@@ -0,0 +1,89 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import User, Post, Group
+from ..utils import EstimatedCountPaginator
+
+
+class PostAdminTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Число запросов списка постов не зависит от числа строк."""
+        url = reverse('admin:posts_post_changelist')
+        author = User.objects.create_user(username='author1')
+        Post.objects.create(text='Пост', author=author, group=self.group)
+        few = self.changelist_queries(url)
+        for number in range(10):
+            author = User.objects.create_user(
+                username='author{}'.format(number + 2)
+            )
+            Group.objects.create(
+                title='Группа', slug='slug{}'.format(number),
+                description='Описание',
+            )
+            Post.objects.create(text='Пост', author=author, group=self.group)
+        self.assertEqual(self.changelist_queries(url), few)
+
+    def test_changelist_uses_autocomplete(self):
+        """Поле группы в списке — автодополнение, а не полный select."""
+        Post.objects.create(text='Пост', author=self.admin, group=self.group)
+        Group.objects.create(
+            title='Другая группа', slug='other', description='Описание'
+        )
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertContains(response, '<option value="{}" selected>{}'.format(
+            self.group.pk, self.group.title
+        ))
+        self.assertNotContains(response, 'Другая группа')
+        self.assertContains(response, 'toplinks')
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(text='Пост {}'.format(number), author=author)
+            for number in range(5)
+        )
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=1)
+    def test_unfiltered_count_is_estimated(self):
+        with self.assertNumQueries(1) as context:
+            count = EstimatedCountPaginator(Post.objects.all(), 2).count
+        self.assertEqual(count, 5)
+        self.assertNotIn('COUNT', context.captured_queries[0]['sql'])
+
+    @override_settings(ESTIMATED_COUNT_THRESHOLD=1)
+    def test_filtered_count_is_exact(self):
+        posts = Post.objects.filter(text='Пост 1')
+        self.assertEqual(EstimatedCountPaginator(posts, 2).count, 1)
+
+    def test_small_table_count_is_exact(self):
+        Post.objects.filter(text='Пост 4').delete()
+        paginator = EstimatedCountPaginator(Post.objects.all(), 2)
+        self.assertEqual(paginator.count, 4)
@@ -0,0 +1,307 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from datetime import timedelta
+
+from django.core.management import CommandError, call_command
+from django.db.models import F, Max, Min
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.storage import shard_name
+
+from .. import benchmark
+from ..models import Comment, FeedEntry, Follow, User, Post, Group
+from ..transfer import export_range, export_tasks
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class ExplainFeedsCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Post.objects.create(
+            text='Тестовый пост',
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент не проходят таблицы целиком."""
+        out = StringIO()
+        call_command('explain_feeds', '--check', stdout=out)
+        self.assertIn('post_group_pub_date_idx', out.getvalue())
+        self.assertIn('post_author_pub_date_idx', out.getvalue())
+        self.assertIn('feed_user_pub_date_idx', out.getvalue())
+
+    def test_cursor_pages_explained(self):
+        """Страницы после курсора тоже читаются по индексу без сортировки."""
+        Follow.objects.create(
+            user=User.objects.create_user(username='reader'),
+            author=self.author,
+        )
+        out = StringIO()
+        call_command('explain_feeds', '--check', stdout=out)
+        output = out.getvalue()
+        for name in ('posts:index (cursor)', 'posts:follow_index (cursor)',
+                     'posts:post_detail (comments, cursor)'):
+            with self.subTest(name=name):
+                self.assertIn(name, output)
+        self.assertNotIn('USE TEMP B-TREE', output)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BenchmarkCommandsTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        call_command(
+            'benchmark_data', '--posts=60', '--users=10', '--groups=3',
+            '--hot-groups=1', '--follows-per-user=3', '--comments=20',
+            '--images=2', stdout=StringIO(),
+        )
+
+    def test_benchmark_data(self):
+        """Генератор создаёт посты, подписки и ленты."""
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertTrue(FeedEntry.objects.exists())
+
+    def test_benchmark_dates_spread(self):
+        """Даты постов разбросаны, комментарии не раньше своих постов."""
+        dates = Post.objects.aggregate(first=Min('pub_date'),
+                                       last=Max('pub_date'))
+        self.assertGreater(dates['last'] - dates['first'], timedelta(days=30))
+        self.assertFalse(
+            Comment.objects.filter(created__lt=F('post__pub_date')).exists()
+        )
+
+    @override_settings(DEBUG=True)
+    def test_measure_without_debug_toolbar(self):
+        """Замер не включает панель отладки даже при DEBUG."""
+        result = benchmark.measure(
+            reverse('posts:index'), iterations=2, warmup=0
+        )
+        self.assertEqual(result['iterations'], 2)
+
+    def test_benchmark_views_baseline(self):
+        """Результаты пишутся в JSON и сравниваются с базовыми."""
+        output = os.path.join(TEMP_MEDIA_ROOT, 'bench.json')
+        call_command(
+            'benchmark_views', '--iterations=3', '--warmup=1',
+            '--output', output, stdout=StringIO(),
+        )
+        with open(output) as source:
+            results = json.load(source)
+        for name in ('posts:index', 'posts:group_list', 'posts:profile',
+                     'posts:post_detail', 'posts:follow_index'):
+            self.assertIn(name, results)
+            self.assertGreater(results[name]['queries_per_request'], 0)
+        for result in results.values():
+            result['queries_per_request'] /= 10
+        with open(output, 'w') as baseline:
+            json.dump(results, baseline)
+        with self.assertRaisesMessage(CommandError, 'queries_per_request'):
+            call_command(
+                'benchmark_views', '--iterations=3', '--warmup=1',
+                '--baseline', output, stdout=StringIO(),
+            )
+
+
+class TransferCommandsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.author = User.objects.create_user(username='auth')
+        self.reader = User.objects.create_user(username='reader')
+        group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание, с запятой и "кавычками"',
+        )
+        self.post = Post.objects.create(
+            text='Пост\nв две строки', author=self.author, group=group,
+        )
+        Post.objects.create(text='Пост без группы', author=self.author)
+        Comment.objects.create(
+            text='Комментарий', post=self.post, author=self.reader
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def snapshot(self):
+        return (
+            list(Group.objects.values_list('pk', 'slug', 'description')),
+            list(Post.objects.values_list(
+                'pk', 'text', 'pub_date', 'author__username', 'group_id',
+                'comments_count'
+            )),
+            list(Comment.objects.values_list(
+                'pk', 'post_id', 'author__username', 'created'
+            )),
+            list(Follow.objects.values_list(
+                'user__username', 'author__username'
+            )),
+        )
+
+    def roundtrip(self, fmt):
+        before = self.snapshot()
+        call_command(
+            'export_content', self.directory, '--format', fmt,
+            stdout=StringIO(),
+        )
+        Group.objects.all().delete()
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        call_command(
+            'import_content', self.directory, '--format', fmt,
+            stdout=StringIO(),
+        )
+        self.assertEqual(self.snapshot(), before)
+        reader = User.objects.get(username='reader')
+        self.assertTrue(
+            FeedEntry.objects.filter(user=reader, post=self.post).exists()
+        )
+
+    def test_ndjson_roundtrip(self):
+        """Выгрузка в NDJSON и загрузка восстанавливают данные."""
+        self.roundtrip('ndjson')
+
+    def test_csv_roundtrip(self):
+        """Выгрузка в CSV и загрузка восстанавливают данные."""
+        self.roundtrip('csv')
+
+    def test_import_is_idempotent(self):
+        """Повторная загрузка не дублирует строки."""
+        call_command('export_content', self.directory, stdout=StringIO())
+        before = self.snapshot()
+        call_command('import_content', self.directory, stdout=StringIO())
+        self.assertEqual(self.snapshot(), before)
+
+    def test_export_parts(self):
+        """Параллельная выгрузка делит диапазон pk на части."""
+        tasks = export_tasks(self.directory, 'ndjson', ['posts'], workers=2)
+        self.assertEqual(len(tasks), 2)
+        self.assertEqual(sum(export_range(*task) for task in tasks), 2)
+
+    def test_import_without_files(self):
+        with self.assertRaises(CommandError):
+            call_command('import_content', self.directory, stdout=StringIO())
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class BenchmarkHttpCommandTests(TestCase):
+    def test_load_server(self):
+        """Нагрузка живого сервера считает запросы и ошибки."""
+        def application(environ, start_response):
+            status = '200 OK' if environ['PATH_INFO'] == '/ok/' else (
+                '404 Not Found'
+            )
+            start_response(status, [('Content-Type', 'text/plain')])
+            return [b'ok']
+
+        server = make_server(
+            '127.0.0.1', 0, application, handler_class=QuietHandler
+        )
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.shutdown)
+        url = 'http://127.0.0.1:{}'.format(server.server_port)
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        output = os.path.join(directory, 'http.json')
+        call_command(
+            'benchmark_http', url, '--path', '/ok/', '--path', '/missing/',
+            '--requests', '6', '--concurrency', '2', '--output', output,
+            stdout=StringIO(),
+        )
+        with open(output) as source:
+            result = json.load(source)[url]
+        self.assertEqual(result['requests'], 6)
+        self.assertEqual(result['errors'], 3)
+
+
+class ShardMediaCommandTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.media_root = os.path.join(directory, 'media')
+        self.object_root = os.path.join(directory, 'objects')
+        self.author = User.objects.create_user(username='auth')
+
+    def create_flat_posts(self):
+        """Посты со старыми именами картинок прямо в posts/."""
+        names = []
+        for number in range(3):
+            # _save пишет под заданным именем, не раскладывая его.
+            names.append(default_storage._save(
+                'posts/old_{}.jpg'.format(number),
+                ContentFile(b'image %d' % number)
+            ))
+        # Картинка без файла и картинка, общая для двух постов.
+        names += ['posts/missing.jpg', names[0]]
+        return [
+            Post.objects.create(text='Пост', author=self.author, image=name)
+            for name in names
+        ]
+
+    def check_sharding(self):
+        posts = self.create_flat_posts()
+        out = StringIO()
+        call_command(
+            'shard_media', '--batch-size=2', '--workers=2', stdout=out
+        )
+        self.assertIn('Файлов не найдено: 1', out.getvalue())
+        for post in posts:
+            old_name = post.image.name
+            post.refresh_from_db()
+            with self.subTest(name=old_name):
+                if old_name == 'posts/missing.jpg':
+                    self.assertEqual(post.image.name, old_name)
+                    continue
+                self.assertEqual(
+                    post.image.name, shard_name(old_name)
+                )
+                self.assertRegex(post.image.name, r'^posts/\w\w/\w\w/old_')
+                self.assertFalse(default_storage.exists(old_name))
+                with default_storage.open(post.image.name) as file:
+                    self.assertTrue(file.read().startswith(b'image '))
+        # Повторный запуск ничего не меняет.
+        call_command('shard_media', stdout=StringIO())
+        self.assertEqual(
+            Post.objects.filter(image__startswith='posts/old').count(), 0
+        )
+
+    def test_filesystem(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            self.check_sharding()
+
+    def test_object_storage(self):
+        with override_settings(
+            DEFAULT_FILE_STORAGE='core.storage.ObjectStorage',
+            OBJECT_STORAGE_ROOT=self.object_root,
+        ):
+            self.check_sharding()
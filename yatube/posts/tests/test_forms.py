@@ -1,3 +1,6 @@
+import hashlib
+from io import BytesIO
+
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
 from django.test import TestCase, override_settings
@@ -5,6 +8,8 @@ from django.test import Client, TestCase
 from django.urls import reverse
 import shutil
 import tempfile
+from PIL import Image
+from core.storage import shard_name
 from ..models import User, Post, Group
 
 
@@ -77,7 +82,9 @@ class PostCreateFormTests(TestCase):
                 group=form_data['group'],
                 text=form_data['text'],
                 author=self.author,
-                image='posts/small.gif'
+                image=shard_name('posts/{}.webp'.format(
+                    hashlib.sha256(small_gif).hexdigest()
+                ))
             ).exists()
         )
 
@@ -111,3 +118,69 @@ class PostCreateFormTests(TestCase):
                 text=form_data['text'],
             ).get().id, response.context['post'].id
         )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageUploadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    @staticmethod
+    def get_jpeg(size, name='photo.jpg'):
+        file_obj = BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        Image.new('RGB', size, (200, 10, 10)).save(
+            file_obj, 'JPEG', exif=exif
+        )
+        return SimpleUploadedFile(
+            name=name,
+            content=file_obj.getvalue(),
+            content_type='image/jpeg'
+        )
+
+    def create_post(self, image, text='Пост с фото'):
+        return self.author_client.post(
+            reverse('posts:post_create'),
+            data={'text': text, 'image': image},
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_image_resized_and_exif_stripped(self):
+        """Картинка уменьшается, перекодируется в WebP и теряет EXIF."""
+        self.create_post(self.get_jpeg((400, 200)))
+        post = Post.objects.get(text='Пост с фото')
+        self.assertTrue(post.image.name.endswith('.webp'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn('exif', image.info)
+
+    def test_identical_uploads_share_file(self):
+        """Одинаковые загрузки сохраняются в один файл."""
+        self.create_post(self.get_jpeg((30, 30), 'first.jpg'), 'Первый')
+        self.create_post(self.get_jpeg((30, 30), 'second.jpg'), 'Второй')
+        first = Post.objects.get(text='Первый')
+        second = Post.objects.get(text='Второй')
+        self.assertEqual(first.image.name, second.image.name)
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_too_large_image_rejected(self):
+        """Слишком большой файл не принимается формой."""
+        response = self.create_post(self.get_jpeg((30, 30)))
+        self.assertFormError(
+            response, 'form', 'image',
+            'Размер картинки не должен превышать 100\xa0байт.'
+        )
+        self.assertFalse(Post.objects.filter(text='Пост с фото').exists())
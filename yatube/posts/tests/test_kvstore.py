@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from sorl.thumbnail.images import ImageFile
+
+from ..kvstore import SqliteKVStore
+
+
+class SqliteKVStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'thumbnails.sqlite3')
+        override = override_settings(THUMBNAIL_KVSTORE_PATH=path)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.store = SqliteKVStore()
+        self.statements = []
+        self.store.connection.set_trace_callback(self.statements.append)
+
+    def image(self, name):
+        image = ImageFile(name)
+        image.set_size((10, 10))
+        return image
+
+    def selects(self):
+        return [sql for sql in self.statements if sql.startswith('SELECT')]
+
+    def test_get_many_reads_once(self):
+        """Все отсутствующие в памяти записи читаются одним запросом."""
+        images = [self.image(f'cache/{number}.jpg') for number in range(3)]
+        for image in images[:2]:
+            self.store.set(image)
+        self.store.memory.clear()
+        found = self.store.get_many(images + [self.image('cache/x.jpg')])
+        self.assertEqual(
+            [image and image.name for image in found],
+            ['cache/0.jpg', 'cache/1.jpg', None, None]
+        )
+        self.assertEqual(found[0].size, [10, 10])
+        self.assertEqual(len(self.selects()), 1)
+
+    def test_hits_served_from_memory(self):
+        image = self.image('cache/a.jpg')
+        self.store.set(image)
+        self.statements.clear()
+        self.assertEqual(self.store.get(image).name, 'cache/a.jpg')
+        self.assertEqual(self.selects(), [])
+
+    def test_misses_not_remembered(self):
+        """Запись другого процесса видна сразу после промаха."""
+        image = self.image('cache/b.jpg')
+        self.assertIsNone(self.store.get(image))
+        other = SqliteKVStore()
+        other.set(image)
+        self.assertEqual(self.store.get(image).name, 'cache/b.jpg')
+
+    @override_settings(THUMBNAIL_KVSTORE_MEMORY_SIZE=2)
+    def test_memory_is_bounded(self):
+        for number in range(5):
+            self.store.set(self.image(f'cache/{number}.jpg'))
+        self.assertEqual(len(self.store.memory), 2)
+
+    def test_delete_and_clear(self):
+        image = self.image('cache/c.jpg')
+        self.store.set(image)
+        self.store.delete(image)
+        self.assertIsNone(self.store.get(image))
+        self.store.set(image)
+        self.store.clear()
+        self.assertIsNone(self.store.get(image))
@@ -1,6 +1,9 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
-from ..models import Group, Post
+from ..models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
@@ -59,3 +62,79 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Коммент'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 1
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1
+        )
+
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 0
+        )
+        post.delete()
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 0
+        )
+
+    def test_save_keeps_version(self):
+        """Правка поста не откатывает версию, изменённую параллельно."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Коммент')
+        post.text = 'Исправленный пост'
+        post.save()
+        post.refresh_from_db()
+        # Комментарий и правка меняют версию по разу.
+        self.assertEqual(post.version, 2)
+
+    def test_save_keeps_comments_count(self):
+        """Сохранение поста не затирает счётчик, выросший после чтения."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(post=post, author=self.reader, text='Коммент')
+        stale.text = 'Исправленный пост'
+        stale.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.text, 'Исправленный пост')
+
+    def test_recount_counters_command(self):
+        """recount_counters восстанавливает рассинхронизированные счётчики."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {count}')
+            for count in range(3)
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserStats.objects.all().delete()
+        call_command('recount_counters', stdout=StringIO())
+        stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(stats.posts_count, 3)
+        self.assertEqual(stats.followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1
+        )
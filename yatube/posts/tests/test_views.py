@@ -1,10 +1,33 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django import forms
+from sorl.thumbnail import default
 from django.core.cache import cache
-from ..models import User, Post, Group, Comment, Follow
+from django.http import QueryDict
+from core.conditional import get_versions
+from ..models import User, Post, Group, Comment, Follow, FeedEntry
 from ..forms import CommentForm
+from ..fragments import post_version
+from ..search import get_backend as get_search_backend
+from ..thumbnails import (
+    create_post_thumbnail, generate_post_thumbnail, warm_thumbnails
+)
+from ..views import (
+    QUANTITY_OF_COMMENTS_ON_PAGE, QUANTITY_OF_FIRST_POSTS,
+    QUANTITY_OF_POSTS_ON_PAGE,
+)
+from .utils import QueryBudgetMixin
 
 User = get_user_model()
 
@@ -177,15 +200,48 @@ class ViewPostsTests(TestCase):
             response, Comment.objects.get(post_id=self.post.id)
         )
 
-    def test_cache_index(self):
-        """Тест кэширования страницы index"""
-        first_request = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.filter(pk=1).delete()
-        second_request = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(first_request.content, second_request.content)
-        cache.clear()
-        third_request = self.authorized_client.get(reverse('posts:index'))
-        self.assertNotEqual(first_request.content, third_request.content)
+    def test_post_card_fragment_cache(self):
+        """Карточка поста кэшируется и сбрасывается при изменении поста."""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        response = self.authorized_client.get(url)
+        self.assertContains(response, self.post.text)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Отредактированный пост'
+        post.save()
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Отредактированный пост')
+
+    def test_post_card_key_has_version(self):
+        """Карточка старой версии не читается, даже оставшись в кэше."""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        # Так версию меняет сигнал в другом процессе: кэш не трогается.
+        Post.objects.filter(pk=self.post.pk).update(
+            text='Новая версия', version=F('version') + 1
+        )
+        self.assertContains(self.authorized_client.get(url), 'Новая версия')
+        Comment.objects.create(
+            text='Коммент', post=self.post, author=self.user
+        )
+        self.assertContains(
+            self.authorized_client.get(url), 'Комментариев: {}'.format(
+                Post.objects.get(pk=self.post.pk).comments_count
+            )
+        )
+
+    def test_index_header_not_shared_between_users(self):
+        """Шапка страницы не кэшируется вместе с карточками."""
+        url = reverse('posts:index')
+        self.authorized_client.get(url)
+        self.assertNotContains(
+            self.guest_client.get(url), self.user.username
+        )
+        self.assertContains(
+            self.author_client.get(url),
+            'Пользователь: {}'.format(self.author.username)
+        )
 
 
 class PaginatorViewsTest(TestCase):
@@ -239,6 +295,123 @@ class PaginatorViewsTest(TestCase):
                 )
 
 
+class KeysetPaginatorViewsTest(TestCase):
+    POSTS_NUMBER = 10
+    REST_POSTS = 3
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(
+                author=cls.author,
+                text=f'Тестовый пост {count}',
+                group=cls.group,
+            )
+            for count in range(13)
+        )
+        # Одинаковая дата проверяет разбиение «ничьих» по id.
+        Post.objects.update(pub_date=Post.objects.first().pub_date)
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_keyset_paginator_walks_all_posts(self):
+        """Курсоры ведут по всем постам вперёд и назад без повторов."""
+        reverse_values = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        )
+        expected = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+        for value in reverse_values:
+            with self.subTest(value=value):
+                cache.clear()
+                first_page = self.author_client.get(
+                    value + '?cursor='
+                ).context['page_obj']
+                self.assertEqual(len(first_page), self.POSTS_NUMBER)
+                self.assertFalse(first_page.has_previous())
+                self.assertTrue(first_page.has_next())
+
+                second_page = self.author_client.get(
+                    value + '?cursor=' + first_page.next_cursor()
+                ).context['page_obj']
+                self.assertEqual(len(second_page), self.REST_POSTS)
+                self.assertFalse(second_page.has_next())
+                self.assertEqual(
+                    [post.pk for post in first_page]
+                    + [post.pk for post in second_page],
+                    expected
+                )
+
+                previous_page = self.author_client.get(
+                    value + '?cursor=' + second_page.previous_cursor()
+                ).context['page_obj']
+                self.assertEqual(
+                    [post.pk for post in previous_page],
+                    [post.pk for post in first_page]
+                )
+                self.assertFalse(previous_page.has_previous())
+
+    def test_keyset_is_default(self):
+        """Лента без параметров читается по курсору, без COUNT(*)."""
+        with CaptureQueriesContext(connection) as queries:
+            page = self.author_client.get(
+                reverse('posts:index')
+            ).context['page_obj']
+        self.assertTrue(page.is_keyset)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in queries
+        ))
+
+    def test_numbered_page_links_into_cursor(self):
+        """«Следующая» нумерованной страницы ведёт в keyset-режим."""
+        response = self.author_client.get(
+            reverse('posts:index'), {'page': 1, 'utm': 'x'}
+        )
+        page = response.context['page_obj']
+        self.assertFalse(getattr(page, 'is_keyset', False))
+        self.assertContains(
+            response, 'href="?utm=x&amp;cursor={}"'.format(page.next_cursor)
+        )
+        # Ссылок на глубокие страницы по номеру нет.
+        self.assertNotContains(response, 'page=2')
+        self.assertNotContains(response, 'Последняя')
+
+    def test_cursor_links_keep_query(self):
+        response = self.author_client.get(
+            reverse('posts:index'), {'utm': 'x'}
+        )
+        self.assertContains(
+            response,
+            'href="?utm=x&amp;cursor={}"'.format(
+                response.context['page_obj'].next_cursor()
+            )
+        )
+
+    def test_keyset_paginator_broken_cursor(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.author_client.get(
+            reverse('posts:index') + '?cursor=broken'
+        )
+        self.assertEqual(
+            len(response.context['page_obj']), self.POSTS_NUMBER
+        )
+
+
 class FollowTests(TestCase):
     ZERO_SUBSCRIBERS = 0
     TWO_SUBSCRIBER = 2
@@ -308,3 +481,622 @@ class FollowTests(TestCase):
             reverse('posts:follow_index')
         )
         self.assertNotContains(response_unsub, self.post.text)
+
+    def test_new_post_fanned_out_to_followers(self):
+        """Новый пост раскладывается в ленты подписчиков."""
+        post = Post.objects.create(
+            author=self.user_following,
+            text='Новая запись для ленты'
+        )
+        self.assertTrue(
+            FeedEntry.objects.filter(
+                user=self.user_follower, post=post
+            ).exists()
+        )
+        self.assertFalse(
+            FeedEntry.objects.filter(
+                user=self.user_follower_second, post=post
+            ).exists()
+        )
+
+    def test_follow_backfills_and_unfollow_trims_feed(self):
+        """Подписка дозаполняет ленту, отписка её очищает."""
+        self.client_auth_follower_second.get(
+            reverse(
+                'posts:profile_follow',
+                kwargs={'username': self.user_following.username}
+            ))
+        self.assertTrue(
+            FeedEntry.objects.filter(
+                user=self.user_follower_second, post=self.post
+            ).exists()
+        )
+        self.client_auth_follower_second.get(
+            reverse(
+                'posts:profile_unfollow',
+                kwargs={'username': self.user_following.username}
+            ))
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.user_follower_second).exists()
+        )
+
+    @override_settings(FEED_FANOUT_LIMIT=2)
+    def test_heavy_author_read_on_request(self):
+        """Посты «тяжёлого» автора читаются в ленте без раскладки."""
+        Follow.objects.create(
+            user=self.user_follower_second, author=self.user_following
+        )
+        post = Post.objects.create(
+            author=self.user_following,
+            text='Запись популярного автора'
+        )
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        response = self.client_auth_follower.get(
+            reverse('posts:follow_index')
+        )
+        self.assertIn(post, response.context['page_obj'])
+
+    @override_settings(FEED_FANOUT_LIMIT=2)
+    def test_unfollow_leaves_backfill_to_command(self):
+        """
+        Автор, ставший «лёгким», читается напрямую, пока
+        backfill_feeds не дозаполнит ленты.
+        """
+        second = Follow.objects.create(
+            user=self.user_follower_second, author=self.user_following
+        )
+        post = Post.objects.create(
+            author=self.user_following, text='Запись без раскладки'
+        )
+        second.delete()
+        self.assertTrue(self.user_following.stats.direct_feed)
+        response = self.client_auth_follower.get(
+            reverse('posts:follow_index')
+        )
+        self.assertIn(post, response.context['page_obj'])
+        call_command('backfill_feeds', stdout=StringIO())
+        self.user_following.stats.refresh_from_db()
+        self.assertFalse(self.user_following.stats.direct_feed)
+        self.assertTrue(
+            FeedEntry.objects.filter(
+                user=self.user_follower, post=post
+            ).exists()
+        )
+
+
+class QueryBudgetViewsTest(QueryBudgetMixin, TestCase):
+    POSTS_NUMBER = 12
+    BUDGETS = {
+        'posts:index': 4,
+        'posts:group_list': 5,
+        # Первые посты профиля и остальные запрашиваются отдельно.
+        'posts:profile': 7,
+        'posts:post_detail': 5,
+        # Отдельно проверяется подписка на «тяжёлых» авторов.
+        'posts:follow_index': 5,
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author_{count}')
+            for count in range(3)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        for count in range(cls.POSTS_NUMBER):
+            post = Post.objects.create(
+                text=f'Тестовый пост {count}',
+                author=cls.authors[count % len(cls.authors)],
+                group=cls.group,
+            )
+            for author in cls.authors:
+                Comment.objects.create(
+                    text='Тестовый коммент', post=post, author=author
+                )
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_views_fit_query_budget(self):
+        """Число запросов страницы не зависит от числа постов."""
+        urls = {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': self.group.slug}
+            ),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': self.authors[0]}
+            ),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.id}
+            ),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+        for name, url in urls.items():
+            with self.subTest(name=name):
+                self.assertQueryBudget(self.client, url, self.BUDGETS[name])
+
+
+class CommentsViewsTest(TestCase):
+    COMMENTS_NUMBER = QUANTITY_OF_COMMENTS_ON_PAGE * 2 + 3
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.author)
+        Comment.objects.bulk_create(
+            Comment(text=f'Коммент {count}', post=cls.post, author=cls.author)
+            for count in range(cls.COMMENTS_NUMBER)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    @override_settings(STREAMING_PAGES=False)
+    def test_post_detail_shows_first_page_newest_first(self):
+        """На странице поста только первая страница новых комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), QUANTITY_OF_COMMENTS_ON_PAGE)
+        self.assertEqual(
+            comments[0].text, f'Коммент {self.COMMENTS_NUMBER - 1}'
+        )
+        self.assertIsNotNone(response.context['comments_cursor'])
+
+    def test_comments_endpoint_pages_through_all(self):
+        """Курсор комментариев проходит их все без повторов."""
+        url = reverse('posts:comments', kwargs={'post_id': self.post.id})
+        seen = 0
+        cursor = ''
+        while True:
+            data = self.client.get(url, {'cursor': cursor}).json()
+            seen += data['html'].count('class="media mb-4"')
+            if not data['next']:
+                break
+            cursor = data['next']
+        self.assertEqual(seen, self.COMMENTS_NUMBER)
+
+    def test_ajax_comment_returns_fragment(self):
+        """AJAX-комментарий возвращает только новый комментарий."""
+        response = self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': 'Новый коммент'},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.status_code, 201)
+        data = response.json()
+        self.assertIn('Новый коммент', data['html'])
+        self.assertTrue(Comment.objects.filter(pk=data['id']).exists())
+
+    def test_ajax_comment_invalid(self):
+        response = self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            {'text': ''},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('text', response.json()['errors'])
+
+
+class StreamingViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        for count in range(QUANTITY_OF_POSTS_ON_PAGE):
+            cls.post = Post.objects.create(
+                text=f'Тестовый пост {count}', author=cls.author
+            )
+        Comment.objects.create(
+            text='Тестовый коммент', post=cls.post, author=cls.author
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def split_response(self, url):
+        """Первый кусок ответа, запросы при его отдаче и остальное."""
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        chunks = iter(response.streaming_content)
+        with CaptureQueriesContext(connection) as queries:
+            first = next(chunks).decode()
+        return first, len(queries), b''.join(chunks).decode()
+
+    def test_post_detail_streams_comments(self):
+        """Начало страницы поста уходит до запроса комментариев."""
+        first, queries, rest = self.split_response(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        self.assertIn(self.post.text, first)
+        self.assertNotIn('Тестовый коммент', first)
+        self.assertEqual(queries, 0)
+        self.assertIn('Тестовый коммент', rest)
+        self.assertIn('</html>', rest)
+
+    def test_profile_streams_posts(self):
+        """Первые посты профиля уходят до запроса остальных."""
+        first, queries, rest = self.split_response(
+            reverse('posts:profile', kwargs={'username': 'auth'})
+        )
+        self.assertEqual(
+            first.count('подробная информация'), QUANTITY_OF_FIRST_POSTS
+        )
+        self.assertEqual(queries, 0)
+        self.assertEqual(
+            rest.count('подробная информация'),
+            QUANTITY_OF_POSTS_ON_PAGE - QUANTITY_OF_FIRST_POSTS
+        )
+
+    @override_settings(STREAMING_PAGES=False)
+    def test_same_page_without_streaming(self):
+        url = reverse('posts:profile', kwargs={'username': 'auth'})
+        response = self.client.get(url)
+        self.assertFalse(response.streaming)
+        self.assertEqual(
+            response.content.decode().count('подробная информация'),
+            QUANTITY_OF_POSTS_ON_PAGE
+        )
+
+
+TEMP_CACHE_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+# Версии страниц работают только с кэшем, общим для процессов.
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': TEMP_CACHE_ROOT,
+}})
+class ConditionalViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.author, group=cls.group
+        )
+        cls.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.author}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}),
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def test_not_modified_without_queries(self):
+        """Совпавший ETag даёт 304 без запросов к базе."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    response = self.guest_client.get(
+                        url, HTTP_IF_NONE_MATCH=etag
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_cache_headers(self):
+        """Анонимным — публичное кэширование, остальным — приватное."""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+        response = self.authorized_client.get(url)
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_etag_depends_on_viewer(self):
+        url = reverse('posts:index')
+        etag = self.guest_client.get(url)['ETag']
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_changes_reset_etag(self):
+        """Новый комментарий и подписка меняют ETag страниц."""
+        changes = {
+            'comment': lambda: Comment.objects.create(
+                text='Коммент', post=self.post, author=self.reader
+            ),
+            'follow': lambda: Follow.objects.create(
+                user=self.reader, author=self.author
+            ),
+        }
+        for name, change in changes.items():
+            with self.subTest(name=name):
+                url = reverse(
+                    'posts:profile', kwargs={'username': self.author}
+                )
+                etag = self.authorized_client.get(url)['ETag']
+                change()
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def assert_etag_kept(self, url, change, kept=True):
+        # Первый ответ выдаёт CSRF-cookie, от которой зависит ETag.
+        self.authorized_client.get(url)
+        etag = self.authorized_client.get(url)['ETag']
+        change()
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304 if kept else 200)
+
+    def test_versions_per_page(self):
+        """Комментарий меняет ETag только страниц, где виден пост."""
+        other_group = Group.objects.create(title='Другая', slug='other')
+        other_post = Post.objects.create(
+            text='Другой пост', author=self.reader, group=other_group
+        )
+
+        def comment():
+            Comment.objects.create(
+                text='Коммент', post=other_post, author=self.reader
+            )
+
+        pages = {
+            'group_list': ({'slug': self.group.slug}, True),
+            'post_detail': ({'post_id': self.post.id}, True),
+            'profile': ({'username': self.author}, True),
+        }
+        for name, (kwargs, kept) in pages.items():
+            with self.subTest(name=name):
+                self.assert_etag_kept(
+                    reverse('posts:' + name, kwargs=kwargs), comment, kept
+                )
+        for name, kwargs in (
+            ('group_list', {'slug': other_group.slug}),
+            ('post_detail', {'post_id': other_post.id}),
+        ):
+            with self.subTest(name=name):
+                self.assert_etag_kept(
+                    reverse('posts:' + name, kwargs=kwargs), comment, False
+                )
+
+    def test_moved_post_changes_old_group(self):
+        other_group = Group.objects.create(title='Другая', slug='other')
+
+        def move():
+            self.post.group = other_group
+            self.post.save()
+
+        self.assert_etag_kept(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            move, False
+        )
+
+    def test_etag_depends_on_csrf_cookie(self):
+        """После смены CSRF-cookie страница с формой отдаётся заново."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.authorized_client.get(url)
+        etag = self.authorized_client.get(url)['ETag']
+        self.authorized_client.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 64
+        response = self.authorized_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }})
+    def test_no_etag_with_process_cache(self):
+        """С кэшем одного процесса ETag не выдаётся и 304 не бывает."""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        self.assertFalse(response.has_header('ETag'))
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 200)
+
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.author,
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        # Хранилище миниатюр живёт вне транзакции теста.
+        default.kvstore.clear()
+        self.client = Client()
+
+    def test_missing_thumbnail_renders_placeholder(self):
+        """Без готовой миниатюры выводится заглушка."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        )
+        self.assertContains(response, 'img/placeholder.svg')
+
+    def test_generated_thumbnail_is_rendered(self):
+        """Созданная заранее миниатюра выводится на странице."""
+        thumbnail = generate_post_thumbnail(self.post.image.name)
+        cache.clear()
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, thumbnail.url)
+                self.assertNotContains(response, 'img/placeholder.svg')
+
+    def test_placeholder_card_not_cached(self):
+        """Карточка с заглушкой не кэшируется и не переживает миниатюру."""
+        url = reverse('posts:index')
+        self.assertContains(self.client.get(url), 'img/placeholder.svg')
+        thumbnail = generate_post_thumbnail(self.post.image.name)
+        response = self.client.get(url)
+        self.assertContains(response, thumbnail.url)
+        self.assertNotContains(response, 'img/placeholder.svg')
+
+    def test_created_thumbnail_changes_page_version(self):
+        """Готовая миниатюра меняет ETag страниц с постами."""
+        key = post_version(self.post.pk)
+        before = get_versions([key])
+        create_post_thumbnail(self.post.pk, self.post.image.name)
+        self.assertNotEqual(get_versions([key]), before)
+
+    def test_feed_prefetches_thumbnails(self):
+        """Миниатюры ленты ищутся одним запросом, а не по карточке."""
+        Post.objects.create(
+            text='Ещё картинка',
+            author=self.author,
+            image=SimpleUploadedFile(
+                name='other.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        for post in Post.objects.all():
+            generate_post_thumbnail(post.image.name)
+        default.kvstore.memory.clear()
+        statements = []
+        default.kvstore.connection.set_trace_callback(statements.append)
+        self.addCleanup(default.kvstore.connection.set_trace_callback, None)
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'img/placeholder.svg')
+        self.assertEqual(
+            len([sql for sql in statements if sql.startswith('SELECT')]), 1
+        )
+
+    def test_warm_thumbnails(self):
+        """Прогрев загружает миниатюры последних постов в память."""
+        thumbnail = generate_post_thumbnail(self.post.image.name)
+        default.kvstore.memory.clear()
+        self.assertEqual(warm_thumbnails(), 1)
+        self.assertEqual(len(default.kvstore.memory), 1)
+        self.assertEqual(warm_thumbnails(count=0), 0)
+        self.assertIn(thumbnail.key, next(iter(default.kvstore.memory)))
+
+
+class SearchViewsTestMixin:
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test_slug',
+            description='Тестовое описание',
+        )
+        cls.best = Post.objects.create(
+            text='Котики, котики и снова котики',
+            author=cls.author,
+            group=cls.group,
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {count} про котики',
+                author=cls.other,
+            )
+            for count in range(12)
+        ]
+        Post.objects.create(text='Про собак', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def search(self, **params):
+        return self.client.get(reverse('posts:search'), params).context
+
+    def test_search_ranks_and_paginates(self):
+        """Поиск ранжирует посты и листает их курсором без повторов."""
+        first_page = self.search(q='котики')
+        self.assertEqual(first_page['post_list'][0], self.best)
+        self.assertEqual(
+            len(first_page['post_list']), QUANTITY_OF_POSTS_ON_PAGE
+        )
+        cursor = QueryDict(first_page['next_query'])['cursor']
+        second_page = self.search(q='котики', cursor=cursor)
+        self.assertIsNone(second_page['next_query'])
+        found = first_page['post_list'] + second_page['post_list']
+        self.assertEqual(len(set(found)), len(self.posts) + 1)
+
+    def test_search_filters(self):
+        """Поиск учитывает фильтры по автору и группе."""
+        self.assertEqual(
+            self.search(q='котики', author='auth')['post_list'], [self.best]
+        )
+        self.assertEqual(
+            self.search(q='котики', group='test_slug')['post_list'],
+            [self.best]
+        )
+        self.assertEqual(self.search(q='котики собак')['post_list'], [])
+
+    def test_search_index_follows_post_changes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        post = self.posts[0]
+        post.text = 'Пост про хомяков'
+        post.save()
+        self.assertEqual(self.search(q='хомяков')['post_list'], [post])
+        post.delete()
+        self.assertEqual(self.search(q='хомяков')['post_list'], [])
+
+
+@override_settings(POST_SEARCH_BACKEND='fts5')
+class Fts5SearchViewsTest(SearchViewsTestMixin, TestCase):
+    pass
+
+
+@override_settings(POST_SEARCH_BACKEND='python')
+class InvertedIndexSearchViewsTest(SearchViewsTestMixin, TestCase):
+    def test_rebuild_is_batched(self):
+        """Перестройка индекса не делает запросов на каждый пост."""
+        with CaptureQueriesContext(connection) as queries:
+            get_search_backend().rebuild()
+        self.assertLess(len(queries), len(self.posts))
+        self.assertEqual(
+            len(self.search(q='котики')['post_list']),
+            QUANTITY_OF_POSTS_ON_PAGE
+        )
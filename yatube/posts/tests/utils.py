@@ -0,0 +1,24 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """Проверка бюджета SQL-запросов на один запрос к странице."""
+
+    def assertQueryBudget(self, client, url, budget):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+            if response.streaming:
+                # Части потоковой страницы запрашивают данные при отдаче.
+                b''.join(response.streaming_content)
+        self.assertLessEqual(
+            len(queries), budget,
+            'Страница {url} выполнила {count} запросов '
+            'при бюджете {budget}:\n{sql}'.format(
+                url=url,
+                count=len(queries),
+                budget=budget,
+                sql='\n'.join(query['sql'] for query in queries),
+            )
+        )
+        return response
@@ -0,0 +1,177 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from .fragments import bump_post_versions, invalidate_post_card
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Размер карточки поста — один для лент и страницы поста.
+POST_IMAGE_GEOMETRY = '960x339'
+POST_IMAGE_OPTIONS = {'crop': 'center', 'upscale': True}
+
+_executor = None
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+class PostThumbnailBackend(ThumbnailBackend):
+    """
+    Бэкенд sorl-thumbnail, который умеет отдавать только уже
+    готовые миниатюры, не уменьшая картинку во время запроса.
+    """
+    def get_options(self, source, options):
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        """Файл миниатюры, каким его создаст get_thumbnail."""
+        source = ImageFile(file_)
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self.get_options(source, options)
+        )
+        return ImageFile(name, default.storage)
+
+    def get_cached_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра из key-value хранилища или None."""
+        if not file_:
+            return None
+        return default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options)
+        )
+
+    def get_cached_thumbnails(self, files, geometry_string, **options):
+        """То же для нескольких файлов, одним обращением к хранилищу."""
+        thumbnails = [
+            self.thumbnail_file(file_, geometry_string, **options)
+            for file_ in files
+        ]
+        if hasattr(default.kvstore, 'get_many'):
+            return default.kvstore.get_many(thumbnails)
+        return [default.kvstore.get(thumbnail) for thumbnail in thumbnails]
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def generate_post_thumbnail(image_name):
+    """Создаёт миниатюру карточки поста для файла из хранилища."""
+    try:
+        return default.backend.get_thumbnail(
+            image_name, POST_IMAGE_GEOMETRY, **POST_IMAGE_OPTIONS
+        )
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', image_name)
+
+
+def cached_post_thumbnail(image):
+    """Готовая миниатюра картинки поста или None."""
+    return default.backend.get_cached_thumbnail(
+        image, POST_IMAGE_GEOMETRY, **POST_IMAGE_OPTIONS
+    )
+
+
+def prefetch_post_thumbnails(posts):
+    """
+    Находит готовые миниатюры для всех постов страницы сразу,
+    чтобы тег post_thumbnail не искал их по одной.
+    Возвращает посты списком.
+    """
+    posts = list(posts)
+    with_images = [post for post in posts if post.image]
+    thumbnails = default.backend.get_cached_thumbnails(
+        [post.image for post in with_images],
+        POST_IMAGE_GEOMETRY, **POST_IMAGE_OPTIONS
+    )
+    for post, thumbnail in zip(with_images, thumbnails):
+        post.prefetched_thumbnail = thumbnail
+    return posts
+
+
+def warm_thumbnails(count=None):
+    """
+    Загружает в память процесса метаданные миниатюр последних
+    THUMBNAIL_WARMUP_POSTS постов; вызывается при старте сервера.
+    """
+    count = settings.THUMBNAIL_WARMUP_POSTS if count is None else count
+    posts = Post.objects.exclude(image='').order_by('-pub_date')
+    try:
+        return sum(
+            thumbnail is not None
+            for thumbnail in default.backend.get_cached_thumbnails(
+                [post.image for post in posts.only('image')[:count]],
+                POST_IMAGE_GEOMETRY, **POST_IMAGE_OPTIONS
+            )
+        )
+    except DatabaseError:
+        # База ещё не создана или не мигрирована: греть нечего.
+        logger.warning('Миниатюры не прогреты', exc_info=True)
+        return 0
+    finally:
+        connection.close()
+
+
+def create_post_thumbnail(post_id, image_name):
+    """
+    Создаёт миниатюру, сбрасывает закэшированную карточку поста
+    и версии страниц поста, чтобы не отдавать 304 с заглушкой.
+    """
+    if generate_post_thumbnail(image_name) is None:
+        return
+    invalidate_post_card(post_id)
+    bump_post_versions(post_id)
+
+
+def _generate_in_worker(post_id, image_name):
+    try:
+        create_post_thumbnail(post_id, image_name)
+    finally:
+        with _pending_lock:
+            _pending.discard(image_name)
+        connection.close()
+
+
+def schedule_post_thumbnail(post):
+    """
+    Ставит создание миниатюры в пул воркеров после фиксации транзакции.
+    Повторно одну и ту же картинку в очередь не ставит.
+    При THUMBNAIL_WORKERS = 0 создаёт миниатюру сразу после фиксации
+    в текущем потоке.
+    """
+    if not post.image:
+        return
+    name = post.image.name
+    if not settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: create_post_thumbnail(post.pk, name))
+        return
+    with _pending_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    transaction.on_commit(
+        lambda: get_executor().submit(_generate_in_worker, post.pk, name)
+    )
@@ -0,0 +1,303 @@
+"""
+Потоковый перенос групп, постов, комментариев и подписок
+в файлы NDJSON/CSV и обратно.
+
+Каждая модель пишется в отдельный файл (или в несколько частей
+при параллельной выгрузке). Пользователи указываются по username,
+остальные связи — по id, поэтому первичные ключи сохраняются.
+"""
+import csv
+import glob
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max, Min
+from django.utils.dateparse import parse_datetime
+
+from .counters import recount_all
+from .feed import rebuild_feeds
+from .models import Comment, Follow, Group, Post
+from .search import get_backend as get_search_backend
+
+User = get_user_model()
+
+BATCH_SIZE = 2000
+FORMATS = ('ndjson', 'csv')
+
+
+class Spec:
+    """Описание переносимой модели: поля файла и их источники."""
+
+    def __init__(self, model, fields, users=(), dates=(), nullable=()):
+        self.model = model
+        # Поле файла -> аргумент values() при выгрузке.
+        self.fields = fields
+        self.users = users
+        self.dates = dates
+        self.nullable = nullable
+
+
+# Порядок важен: при загрузке связанные строки должны уже существовать.
+SPECS = {
+    'groups': Spec(Group, {
+        'id': 'id',
+        'title': 'title',
+        'slug': 'slug',
+        'description': 'description',
+    }),
+    'posts': Spec(Post, {
+        'id': 'id',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'author': 'author__username',
+        'group': 'group_id',
+        'image': 'image',
+    }, users=('author',), dates=('pub_date',), nullable=('group',)),
+    'comments': Spec(Comment, {
+        'id': 'id',
+        'post': 'post_id',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    }, users=('author',), dates=('created',)),
+    'follows': Spec(Follow, {
+        'user': 'user__username',
+        'author': 'author__username',
+    }, users=('user', 'author')),
+}
+
+
+def part_paths(directory, name, fmt):
+    """Файлы модели: целый файл и части параллельной выгрузки."""
+    paths = glob.glob(os.path.join(directory, '{}.{}'.format(name, fmt)))
+    paths += sorted(glob.glob(
+        os.path.join(directory, '{}.*.{}'.format(name, fmt))
+    ))
+    return paths
+
+
+def serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class NdjsonWriter:
+    def __init__(self, stream, fields):
+        self.stream = stream
+
+    def write(self, row):
+        self.stream.write(json.dumps(row, ensure_ascii=False))
+        self.stream.write('\n')
+
+
+class CsvWriter:
+    def __init__(self, stream, fields):
+        self.writer = csv.DictWriter(stream, fieldnames=list(fields))
+        self.writer.writeheader()
+
+    def write(self, row):
+        self.writer.writerow(
+            {key: '' if value is None else value
+             for key, value in row.items()}
+        )
+
+
+WRITERS = {'ndjson': NdjsonWriter, 'csv': CsvWriter}
+
+
+def read_rows(path, fmt):
+    """Построчно читает файл, не загружая его в память целиком."""
+    with open(path, newline='', encoding='utf-8') as stream:
+        if fmt == 'csv':
+            yield from csv.DictReader(stream)
+            return
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+def export_range(name, path, fmt, first=None, last=None,
+                 batch_size=BATCH_SIZE):
+    """
+    Выгружает строки модели с pk в диапазоне [first, last] в файл.
+    Возвращает число выгруженных строк.
+    """
+    spec = SPECS[name]
+    rows = spec.model.objects.order_by('pk')
+    if first is not None:
+        rows = rows.filter(pk__gte=first, pk__lte=last)
+    rows = rows.values_list(*spec.fields.values())
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as stream:
+        writer = WRITERS[fmt](stream, spec.fields)
+        for values in rows.iterator(chunk_size=batch_size):
+            writer.write(dict(zip(
+                spec.fields, (serialize(value) for value in values)
+            )))
+            count += 1
+    return count
+
+
+def export_part(args):
+    """Выгрузка части в дочернем процессе."""
+    count = export_range(*args)
+    connections.close_all()
+    return count
+
+
+def export_ranges(name, workers):
+    """Делит диапазон pk модели на workers смежных частей."""
+    bounds = SPECS[name].model.objects.aggregate(
+        first=Min('pk'), last=Max('pk')
+    )
+    first, last = bounds['first'], bounds['last']
+    if first is None:
+        return []
+    step = (last - first) // workers + 1
+    return [
+        (start, min(start + step - 1, last))
+        for start in range(first, last + 1, step)
+    ]
+
+
+def export_tasks(directory, fmt, names, workers=1, batch_size=BATCH_SIZE):
+    """Задания на выгрузку: (модель, файл, формат, первый pk, последний pk)."""
+    tasks = []
+    for name in names:
+        if workers <= 1:
+            tasks.append((
+                name, os.path.join(directory, '{}.{}'.format(name, fmt)),
+                fmt, None, None, batch_size,
+            ))
+            continue
+        for number, (first, last) in enumerate(export_ranges(name, workers)):
+            tasks.append((
+                name,
+                os.path.join(
+                    directory, '{}.{:03d}.{}'.format(name, number, fmt)
+                ),
+                fmt, first, last, batch_size,
+            ))
+    return tasks
+
+
+def resolve_users(usernames):
+    """
+    Возвращает {username: id} для пачки строк.
+    Отсутствующие пользователи создаются без пароля.
+    """
+    usernames = set(usernames)
+    ids = dict(User.objects.filter(
+        username__in=usernames
+    ).values_list('username', 'pk'))
+    new = usernames - ids.keys()
+    if new:
+        User.objects.bulk_create(
+            (User(username=username, password='!') for username in new),
+            ignore_conflicts=True,
+        )
+        ids.update(User.objects.filter(
+            username__in=new
+        ).values_list('username', 'pk'))
+    return ids
+
+
+def build_object(spec, row, users):
+    values = {}
+    for field, value in row.items():
+        if field not in spec.fields:
+            continue
+        if field in spec.users:
+            values[field + '_id'] = users[value]
+        elif field in spec.dates:
+            values[field] = parse_datetime(value)
+        elif field in spec.nullable and value in ('', None):
+            values[field + '_id'] = None
+        elif field in ('group', 'post'):
+            values[field + '_id'] = int(value)
+        elif field == 'id':
+            values['pk'] = int(value)
+        else:
+            values[field] = value
+    return spec.model(**values)
+
+
+@contextmanager
+def keep_dates(*fields):
+    """Отключает auto_now_add, чтобы сохранить даты из файла."""
+    previous = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, previous):
+            field.auto_now_add = value
+
+
+def import_file(name, path, fmt, batch_size=BATCH_SIZE):
+    """
+    Загружает файл пачками через bulk_create.
+    Уже существующие строки пропускаются, поэтому загрузку
+    можно безопасно повторить. Возвращает число прочитанных строк.
+    """
+    spec = SPECS[name]
+    count = 0
+    batch = []
+
+    def flush():
+        # Пользователи ищутся по пачке, а не копятся в памяти.
+        ids = resolve_users(
+            row[field] for row in batch for field in spec.users
+        )
+        with transaction.atomic():
+            spec.model.objects.bulk_create(
+                (build_object(spec, row, ids) for row in batch),
+                batch_size=batch_size,
+                ignore_conflicts=True,
+            )
+        batch.clear()
+
+    with keep_dates(
+        Post._meta.get_field('pub_date'),
+        Comment._meta.get_field('created'),
+    ):
+        for row in read_rows(path, fmt):
+            batch.append(row)
+            count += 1
+            if len(batch) == batch_size:
+                flush()
+        if batch:
+            flush()
+    return count
+
+
+def import_part(args):
+    """Загрузка части в дочернем процессе."""
+    count = import_file(*args)
+    connections.close_all()
+    return count
+
+
+def reset_sequences(names):
+    """Сдвигает счётчики первичных ключей за загруженные id."""
+    models = [SPECS[name].model for name in names]
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+
+
+def rebuild_derived():
+    """
+    Пересобирает данные, которые обычно поддерживают сигналы:
+    bulk_create их не вызывает.
+    """
+    recount_all()
+    rebuild_feeds()
+    get_search_backend().rebuild()
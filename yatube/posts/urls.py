@@ -1,12 +1,11 @@
 from django.urls import path
-from django.views.decorators.cache import cache_page
 from . import views
 
 app_name = 'posts'
 
 
 urlpatterns = [
-    path('', cache_page(20)(views.index), name='index'),
+    path('', views.index, name='index'),
     path('group/<slug:slug>/', views.groups, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
@@ -16,7 +15,12 @@ urlpatterns = [
         'posts/<int:post_id>/comment/',
         views.add_comment, name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comments, name='comments'
+    ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('search/', views.search, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
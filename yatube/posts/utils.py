@@ -1,7 +1,265 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
 
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 
-def paginator_calculate(request, posts, quantity_of_posts_on_page):
+CURSOR_PARAM = 'cursor'
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+
+
+def pack_cursor(*parts):
+    """Упаковывает части ключа в непрозрачную строку курсора."""
+    raw = '|'.join(str(part) for part in parts)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def unpack_cursor(cursor):
+    """Распаковывает курсор в список строк; для испорченного — None."""
+    if not cursor:
+        return None
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        return base64.urlsafe_b64decode(cursor + padding).decode().split('|')
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def encode_cursor(post, direction=CURSOR_NEXT):
+    """Упаковывает ключ (pub_date, id) поста в непрозрачный курсор."""
+    return pack_cursor(direction, post.pub_date.isoformat(), post.pk)
+
+
+def decode_cursor(cursor):
+    """
+    Распаковывает курсор в (direction, pub_date, id).
+    Для пустого или испорченного курсора возвращает None.
+    """
+    parts = unpack_cursor(cursor)
+    if parts is None or len(parts) != 3:
+        return None
+    direction, date, pk = parts
+    try:
+        pub_date = parse_datetime(date)
+        pk = int(pk)
+    except ValueError:
+        return None
+    if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+def encode_comment_cursor(comment):
+    """Упаковывает ключ (created, id) комментария в курсор."""
+    return pack_cursor(comment.created.isoformat(), comment.pk)
+
+
+def decode_comment_cursor(cursor):
+    parts = unpack_cursor(cursor)
+    if parts is None or len(parts) != 2:
+        return None
+    try:
+        created = parse_datetime(parts[0])
+        pk = int(parts[1])
+    except ValueError:
+        return None
+    if created is None:
+        return None
+    return created, pk
+
+
+def comments_queryset(comments, cursor, limit):
+    """
+    Запрос страницы комментариев от новых к старым по ключу
+    (created, id): limit + 1 строк после курсора.
+    """
+    comments = comments.order_by('-created', '-pk')
+    after = decode_comment_cursor(cursor)
+    if after is not None:
+        created, pk = after
+        comments = comments.filter(
+            Q(created__lte=created),
+            Q(created__lt=created) | Q(created=created, pk__lt=pk)
+        )
+    return comments[:limit + 1]
+
+
+def comments_page(comments, cursor, limit):
+    """
+    Страница комментариев от новых к старым.
+    Возвращает (комментарии, курсор следующей страницы или None).
+    """
+    page = list(comments_queryset(comments, cursor, limit))
+    if len(page) <= limit:
+        return page, None
+    page = page[:limit]
+    return page, encode_comment_cursor(page[-1])
+
+
+class KeysetPage(Page):
+    """
+    Страница keyset-пагинации.
+    Не знает своего номера и общего числа страниц,
+    зато умеет выдавать курсоры на соседние страницы.
+    """
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Keyset page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return encode_cursor(self.object_list[-1], CURSOR_NEXT)
+
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return encode_cursor(self.object_list[0], CURSOR_PREVIOUS)
+
+
+class KeysetPaginator(Paginator):
+    """
+    Пагинатор по ключу (pub_date, id).
+    Не выполняет COUNT(*) и OFFSET: каждая страница — это
+    диапазонное чтение от курсора, поэтому цена страницы
+    не зависит от её глубины.
+    Если выборка явно упорядочена по убыванию двух других полей
+    с теми же значениями (например, по записи ленты подписок),
+    ключом служат они.
+    """
+    def keys(self):
+        ordering = self.object_list.query.order_by
+        if len(ordering) == 2 and all(
+            isinstance(field, str) and field.startswith('-')
+            for field in ordering
+        ):
+            return ordering[0][1:], ordering[1][1:]
+        return 'pub_date', 'pk'
+
+    def page_queryset(self, cursor):
+        """
+        Запрос страницы: per_page + 1 строк от курсора.
+        Возвращает (выборка, направление курсора или None).
+        """
+        date_key, pk_key = self.keys()
+        decoded = decode_cursor(cursor)
+        posts = self.object_list
+        if decoded is None:
+            return posts.order_by('-' + date_key, '-' + pk_key)[
+                :self.per_page + 1
+            ], None
+        direction, pub_date, pk = decoded
+        # Отдельная граница по дате даёт базе диапазон индекса:
+        # условие с OR само по себе индексом не ограничивается.
+        if direction == CURSOR_NEXT:
+            return posts.filter(
+                Q(**{date_key + '__lte': pub_date}),
+                Q(**{date_key + '__lt': pub_date})
+                | Q(**{date_key: pub_date, pk_key + '__lt': pk})
+            ).order_by('-' + date_key, '-' + pk_key)[
+                :self.per_page + 1
+            ], direction
+        return posts.filter(
+            Q(**{date_key + '__gte': pub_date}),
+            Q(**{date_key + '__gt': pub_date})
+            | Q(**{date_key: pub_date, pk_key + '__gt': pk})
+        ).order_by(date_key, pk_key)[:self.per_page + 1], direction
+
+    def get_page(self, cursor):
+        queryset, direction = self.page_queryset(cursor)
+        object_list = list(queryset)
+        if direction == CURSOR_PREVIOUS:
+            has_previous = len(object_list) > self.per_page
+            object_list = object_list[:self.per_page][::-1]
+            return KeysetPage(object_list, self, True, has_previous)
+        has_next = len(object_list) > self.per_page
+        return KeysetPage(
+            object_list[:self.per_page], self, has_next,
+            direction == CURSOR_NEXT
+        )
+
+
+def estimate_count(queryset):
+    """
+    Приблизительное число строк таблицы модели без COUNT(*):
+    статистика планировщика PostgreSQL и MySQL, для остальных
+    баз — наибольший первичный ключ.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s', [table]
+            )
+            row = cursor.fetchone()
+            return int(row[0]) if row else None
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT table_rows FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = %s',
+                [table]
+            )
+            row = cursor.fetchone()
+            return int(row[0]) if row else None
+    return model._default_manager.using(queryset.db).aggregate(
+        last=Max('pk')
+    )['last'] or 0
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для больших таблиц.
+    Для выборки без фильтров берёт оценку числа строк, если она
+    больше ESTIMATED_COUNT_THRESHOLD; иначе считает точно.
+    """
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_count(queryset)
+            if estimate is not None and estimate >= getattr(
+                settings, 'ESTIMATED_COUNT_THRESHOLD', 10000
+            ):
+                return estimate
+        return super().count
+
+
+def paginator_calculate(request, posts, quantity_of_posts_on_page,
+                        keyset=True):
+    """
+    Постраничный вывод постов.
+    По умолчанию используется keyset-пагинация по курсору из параметра
+    cursor: без COUNT(*) и OFFSET. Нумерованная страница отдаётся
+    по параметру page или, если keyset=False, по умолчанию.
+    """
+    if CURSOR_PARAM in request.GET or (keyset and 'page' not in request.GET):
+        paginator = KeysetPaginator(posts, quantity_of_posts_on_page)
+        return paginator.get_page(request.GET.get(CURSOR_PARAM))
     paginator = Paginator(posts, quantity_of_posts_on_page)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    if page_obj.has_next():
+        # Ссылка «Следующая» ведёт в keyset-режим: дальше без OFFSET.
+        page_obj.next_cursor = encode_cursor(page_obj[len(page_obj) - 1])
+    return page_obj
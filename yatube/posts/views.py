@@ -1,41 +1,96 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+from core.conditional import conditional_page
+from core.routers import replica_reads
+from core.streaming import Deferred, render_page
 from .models import Post, Group, Follow
 from .forms import PostForm, CommentForm
-from .utils import paginator_calculate
+from .feed import feed_posts
+from .counters import user_stats
+from .fragments import (
+    POSTS_VERSION, SITE_VERSION, group_version, post_version, user_version
+)
+from .thumbnails import prefetch_post_thumbnails, schedule_post_thumbnail
+from .search import search_posts
+from .utils import comments_page, paginator_calculate
 
 
 User = get_user_model()
 
 QUANTITY_OF_POSTS_ON_PAGE = 10
+QUANTITY_OF_COMMENTS_ON_PAGE = 20
+# Сколько постов профиля отрисовывается до первой отправки.
+QUANTITY_OF_FIRST_POSTS = 3
 
 
+def index_keys(request):
+    return [SITE_VERSION, POSTS_VERSION]
+
+
+def group_keys(request, slug):
+    return [SITE_VERSION, group_version(slug)]
+
+
+def profile_keys(request, username):
+    return [SITE_VERSION, user_version(username)]
+
+
+def post_keys(request, post_id):
+    """
+    На странице поста видны и счётчики автора. Автор поста
+    не меняется, поэтому его имя кэшируется без срока.
+    """
+    key = 'post_author:{}'.format(post_id)
+    username = cache.get(key)
+    if username is None:
+        username = Post.objects.filter(pk=post_id).values_list(
+            'author__username', flat=True
+        ).first()
+        if username is None:
+            return [SITE_VERSION, post_version(post_id)]
+        cache.set(key, username, None)
+    return [SITE_VERSION, post_version(post_id), user_version(username)]
+
+
+def follow_keys(request):
+    return [SITE_VERSION, POSTS_VERSION, user_version(request.user.username)]
+
+
+@conditional_page(index_keys)
+@replica_reads
 def index(request):
     """
     Главная страница.
     """
     template = 'posts/index.html'
-    post_list = Post.objects.all()
+    post_list = Post.objects.select_related('author', 'group')
     page_obj = paginator_calculate(request,
                                    post_list,
                                    QUANTITY_OF_POSTS_ON_PAGE)
+    page_obj.object_list = prefetch_post_thumbnails(page_obj.object_list)
     context = {
         'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
+@conditional_page(group_keys)
+@replica_reads
 def groups(request, slug):
     """
     Посты Группы.
     """
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
+    post_list = group.posts.select_related('author', 'group')
     page_obj = paginator_calculate(request,
                                    post_list,
                                    QUANTITY_OF_POSTS_ON_PAGE)
+    page_obj.object_list = prefetch_post_thumbnails(page_obj.object_list)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -43,13 +98,17 @@ def groups(request, slug):
     return render(request, template, context)
 
 
+@conditional_page(profile_keys)
+@replica_reads
 def profile(request, username):
     """
     Профиль.
     """
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    post_count = post_list.count()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    stats = user_stats(author)
+    post_list = author.posts.select_related('author', 'group')
     page_obj = paginator_calculate(request,
                                    post_list,
                                    QUANTITY_OF_POSTS_ON_PAGE)
@@ -65,26 +124,104 @@ def profile(request, username):
         'author': author,
         'post_list': post_list,
         'page_obj': page_obj,
-        'post_count': post_count,
+        'first_posts': prefetch_post_thumbnails(
+            page_obj.object_list[:QUANTITY_OF_FIRST_POSTS]
+        ),
+        'more_posts': Deferred(
+            'posts/includes/profile_posts.html',
+            lambda: {'posts': prefetch_post_thumbnails(
+                page_obj.object_list[QUANTITY_OF_FIRST_POSTS:]
+            )}
+        ),
+        'post_count': stats.posts_count,
+        'stats': stats,
         'following': following,
     }
-    return render(request, template, context)
+    return render_page(request, template, context)
 
 
+@conditional_page(post_keys)
+@replica_reads
 def post_detail(request, post_id):
     """
     Посты автора.
     """
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    post_count = post.author.posts.count()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        pk=post_id
+    )
+
+    def comment_thread():
+        comments, comments_cursor = comments_page(
+            post.comments.select_related('author'),
+            request.GET.get('cursor'),
+            QUANTITY_OF_COMMENTS_ON_PAGE
+        )
+        return {'comments': comments, 'comments_cursor': comments_cursor}
+
+    post_count = user_stats(post.author).posts_count
     form = CommentForm(request.POST or None)
     context = {
         'post_count': post_count,
         'post': post,
         'form': form,
+        'comment_thread': Deferred(
+            'includes/comment_thread.html', comment_thread
+        ),
     }
-    return render(request, template, context)
+    return render_page(request, template, context)
+
+
+@replica_reads
+def comments(request, post_id):
+    """
+    Следующая страница комментариев поста: фрагмент HTML и курсор.
+    """
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comment_list, next_cursor = comments_page(
+        post.comments.select_related('author'),
+        request.GET.get('cursor'),
+        QUANTITY_OF_COMMENTS_ON_PAGE
+    )
+    html = render_to_string(
+        'includes/comment_list.html', {'comments': comment_list}, request
+    )
+    return JsonResponse({'html': html, 'next': next_cursor})
+
+
+@replica_reads
+def search(request):
+    """
+    Поиск по постам.
+    """
+    query = request.GET.get('q', '')
+    author = None
+    group = None
+    if request.GET.get('author'):
+        author = get_object_or_404(User, username=request.GET['author'])
+    if request.GET.get('group'):
+        group = get_object_or_404(Group, slug=request.GET['group'])
+    post_list, next_cursor = search_posts(
+        query,
+        QUANTITY_OF_POSTS_ON_PAGE,
+        author_id=author.pk if author else None,
+        group_id=group.pk if group else None,
+        cursor=request.GET.get('cursor'),
+    )
+    next_query = None
+    if next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        next_query = params.urlencode()
+    context = {
+        'query': query,
+        'author': author,
+        'group': group,
+        'post_list': prefetch_post_thumbnails(post_list),
+        'next_query': next_query,
+    }
+    return render(request, 'posts/search.html', context)
 
 
 @login_required
@@ -92,14 +229,13 @@ def post_create(request):
     """
     Создание поста.
     """
-    if request.method == 'POST':
-        form = PostForm(request.POST, files=request.FILES or None)
-        if form.is_valid():
-            post = form.save(commit=False)
-            post.author = request.user
-            post.save()
-            return redirect('posts:profile', request.user.username)
-    form = PostForm()
+    form = PostForm(request.POST or None, files=request.FILES or None)
+    if form.is_valid():
+        post = form.save(commit=False)
+        post.author = request.user
+        post.save()
+        schedule_post_thumbnail(post)
+        return redirect('posts:profile', request.user.username)
     template = 'posts/create_post.html'
     context = {
         'form': form,
@@ -122,6 +258,8 @@ def post_edit(request, post_id):
             )
             if form.is_valid():
                 post = form.save()
+                if 'image' in form.changed_data:
+                    schedule_post_thumbnail(post)
                 return redirect('posts:post_detail', post_id=post.id)
         else:
             form = PostForm(files=request.FILES or None, instance=post)
@@ -135,22 +273,41 @@ def post_edit(request, post_id):
 
 @login_required
 def add_comment(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    """
+    Добавление комментария.
+    На AJAX-запрос отвечает JSON с разметкой нового комментария
+    вместо перенаправления на страницу поста.
+    """
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
     form = CommentForm(request.POST or None)
-    if form.is_valid():
-        comment = form.save(commit=False)
-        comment.author = request.user
-        comment.post = post
-        comment.save()
+    if not form.is_valid():
+        if request.is_ajax():
+            return JsonResponse({'errors': form.errors}, status=400)
+        return redirect('posts:post_detail', post_id=post_id)
+    comment = form.save(commit=False)
+    comment.author = request.user
+    comment.post = post
+    comment.save()
+    if request.is_ajax():
+        html = render_to_string(
+            'includes/comment.html', {'comment': comment}, request
+        )
+        return JsonResponse({'id': comment.pk, 'html': html}, status=201)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
+@conditional_page(follow_keys)
+@replica_reads
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
+    post_list = feed_posts(request.user).select_related('author', 'group')
     page_obj = paginator_calculate(request,
                                    post_list,
-                                   QUANTITY_OF_POSTS_ON_PAGE)
+                                   QUANTITY_OF_POSTS_ON_PAGE,
+                                   # Лента подписок открывается нумерованной
+                                   # страницей, «Следующая» ведёт по курсору.
+                                   keyset=False)
+    page_obj.object_list = prefetch_post_thumbnails(page_obj.object_list)
     context = {
         'page_obj': page_obj,
     }
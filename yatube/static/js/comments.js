@@ -0,0 +1,47 @@
+// Отправка комментария и подгрузка следующих страниц без перезагрузки.
+(function () {
+  var list = document.getElementById('comments');
+  if (!list) {
+    return;
+  }
+  var headers = {'X-Requested-With': 'XMLHttpRequest'};
+
+  var form = document.querySelector('[data-comment-form]');
+  if (form) {
+    form.addEventListener('submit', function (event) {
+      event.preventDefault();
+      fetch(form.action, {
+        method: 'POST',
+        headers: headers,
+        body: new FormData(form),
+        credentials: 'same-origin'
+      }).then(function (response) {
+        return response.json().then(function (data) {
+          if (response.ok) {
+            list.insertAdjacentHTML('afterbegin', data.html);
+            form.reset();
+          }
+        });
+      });
+    });
+  }
+
+  var more = document.querySelector('[data-more-comments]');
+  if (more) {
+    more.addEventListener('click', function (event) {
+      event.preventDefault();
+      var url = more.dataset.moreComments + '?cursor=' +
+        encodeURIComponent(more.dataset.cursor);
+      fetch(url, {headers: headers, credentials: 'same-origin'})
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          list.insertAdjacentHTML('beforeend', data.html);
+          if (data.next) {
+            more.dataset.cursor = data.next;
+          } else {
+            more.remove();
+          }
+        });
+    });
+  }
+})();
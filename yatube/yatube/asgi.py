@@ -0,0 +1,23 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named
+``application``. Requests are served by the regular Django handler
+in a bounded thread pool, see core.asgi.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+django_application = get_wsgi_application()
+
+from core.asgi import AsgiHandler  # noqa: E402
+from core.static import StaticFiles  # noqa: E402
+from posts.thumbnails import warm_thumbnails  # noqa: E402
+
+application = AsgiHandler(StaticFiles(django_application))
+
+warm_thumbnails()
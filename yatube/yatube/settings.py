@@ -56,11 +56,16 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
     'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
+    'core.middleware.TemplateProfilingMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,8 +85,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Разобранные шаблоны переиспользуются между запросами
+            # и при DEBUG; после правки шаблона нужен перезапуск.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -93,6 +105,10 @@ TEMPLATES = [
     },
 ]
 
+# Шаблоны приложений находит app_directories.Loader внутри
+# кэширующего загрузчика, APP_DIRS для этого не нужен.
+SILENCED_SYSTEM_CHECKS = ['debug_toolbar.W006']
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
@@ -103,9 +119,33 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение переиспользуется между запросами одного потока.
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            # Сколько секунд ждать снятия блокировки базы.
+            'timeout': 5,
+        },
     }
 }
 
+# Реплики только для чтения: пути к копиям базы SQLite через запятую,
+# например YATUBE_REPLICAS=/srv/replica1.sqlite3,/srv/replica2.sqlite3.
+# Локально копии обновляет команда sync_replicas.
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.environ.get('YATUBE_REPLICAS', '').split(','))
+):
+    alias = 'replica_{}'.format(number)
+    DATABASES[alias] = dict(
+        DATABASES['default'], NAME=path, TEST={'MIRROR': 'default'}
+    )
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи пользователь читает только основную базу.
+# Столько же реплика считается отстающей от изменения.
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -148,6 +188,17 @@ STATIC_URL = '/static/'
 # Static Directory (CSS, JavaScript, Images)
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# collectstatic собирает сюда статику с хэшами в именах и сжатыми
+# копиями (.gz, .br при установленном brotli); отдаёт её
+# core.static.StaticFiles в yatube/wsgi.py и yatube/asgi.py.
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+# Файлы меньше этого размера не сжимаются.
+STATIC_COMPRESS_MIN_SIZE = 512
+# Кэширование статики: с хэшем в имени — на год, без хэша — на час.
+STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+STATIC_MAX_AGE = 60 * 60
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
@@ -163,9 +214,128 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-# Для подключения бэкенда кеширования
-CACHES = {
-    'default': {
+# Загруженные файлы раскладываются по подкаталогам по хэшу имени:
+# posts/3f/a2/имя. Старые файлы переносит команда shard_media.
+DEFAULT_FILE_STORAGE = 'core.storage.ShardedFileSystemStorage'
+MEDIA_SHARDED_DIRS = ('posts',)
+# Уровней подкаталогов: 2 уровня по 256 — 65 536 каталогов.
+MEDIA_SHARD_DEPTH = 2
+# Каталог core.storage.LocalObjectStore — локальной замены S3
+# для DEFAULT_FILE_STORAGE = 'core.storage.ObjectStorage'.
+OBJECT_STORAGE_ROOT = os.path.join(BASE_DIR, 'objectstore')
+
+# Для подключения бэкенда кеширования.
+# locmem — свой кэш у каждого процесса; file и memcached —
+# общий кэш для всех воркеров.
+CACHE_BACKENDS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache')
+        ),
+    },
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION', '127.0.0.1:11211'
+        ),
+    },
+}
+CACHES = {
+    'default': CACHE_BACKENDS[os.environ.get('YATUBE_CACHE', 'locmem')],
+}
+# Сколько секунд отдавать устаревшее значение, пока его пересобирают.
+CACHE_STALE_GRACE = 60
+# Время жизни блокировки пересборки значения.
+CACHE_REBUILD_LOCK_TIMEOUT = 30
+
+# Число подписчиков, начиная с которого посты автора
+# не раскладываются по лентам, а читаются при запросе.
+FEED_FANOUT_LIMIT = 1000
+
+# Миниатюры картинок постов создаются в фоне, а не во время запроса.
+THUMBNAIL_BACKEND = 'posts.thumbnails.PostThumbnailBackend'
+# Сколько потоков создают миниатюры; 0 — создавать миниатюру сразу
+# после фиксации транзакции, без пула (так запускаются тесты).
+THUMBNAIL_WORKERS = int(os.environ.get('YATUBE_THUMBNAIL_WORKERS', 2))
+# Метаданные миниатюр — в отдельном файле SQLite (posts.kvstore);
+# по умолчанию thumbnails.sqlite3 рядом с основной базой.
+THUMBNAIL_KVSTORE = 'posts.kvstore.SqliteKVStore'
+THUMBNAIL_KVSTORE_PATH = os.environ.get('YATUBE_THUMBNAIL_KVSTORE')
+# Сколько записей хранилища держит в памяти каждый процесс.
+THUMBNAIL_KVSTORE_MEMORY_SIZE = 20000
+# Для скольких последних постов метаданные загружаются при старте.
+THUMBNAIL_WARMUP_POSTS = 1000
+
+# Обработка загружаемых картинок постов.
+POST_IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+POST_IMAGE_MAX_SIDE = 1920
+POST_IMAGE_FORMAT = 'WEBP'
+POST_IMAGE_QUALITY = 85
+
+# Бэкенд поиска: fts5 (SQLite FTS5), python (инвертированный индекс
+# в таблице SearchToken) или auto — fts5, если SQLite его поддерживает.
+POST_SEARCH_BACKEND = 'auto'
+
+# Доля запросов, для которых собираются метрики (0 — выключено).
+METRICS_SAMPLE_RATE = 0
+
+# Профилирование шаблонов: время каждого шаблона, include и тега
+# пишется в лог yatube.templates, самые долгие — в Server-Timing.
+TEMPLATE_PROFILING = bool(os.environ.get('YATUBE_TEMPLATE_PROFILING'))
+TEMPLATE_PROFILING_TOP = 20
+
+# Сжатие ответов gzip: уровень 1–9 (0 — выключено), минимальный
+# размер тела в байтах и типы содержимого, которые стоит сжимать.
+COMPRESSION_LEVEL = 6
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_TYPES = (
+    'text/html', 'text/plain', 'text/css', 'text/xml',
+    'application/json', 'application/javascript', 'image/svg+xml',
+)
+
+# Профиль и страница поста отдаются потоком: начало страницы
+# уходит до того, как запрошены остальные посты и комментарии.
+STREAMING_PAGES = True
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'yatube.templates': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+# Начиная с этого числа строк админка показывает оценку
+# вместо точного COUNT(*) по таблице.
+ESTIMATED_COUNT_THRESHOLD = 10000
+
+# Условные ответы HTML-страниц; работают только с общим кэшем
+# (YATUBE_CACHE=file или memcached). CONTENT_RELEASE входит в ETag:
+# его смена при выкладке сбрасывает ETag после изменения шаблонов.
+CONTENT_RELEASE = os.environ.get('YATUBE_RELEASE', '')
+# Сколько секунд анонимную страницу можно отдавать из кэша без проверки.
+HTML_CACHE_MAX_AGE = 0
+
+# Число потоков, в которых ASGI-приложение выполняет запросы.
+ASGI_THREADS = 8
+
+# Прагмы SQLite, выполняемые при каждом подключении (см. core.db).
+# WAL позволяет читать базу во время записи.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'busy_timeout': 5000,
 }
+# Повторы запроса вне транзакции при «database is locked»:
+# пауза перед n-м повтором — SQLITE_LOCK_BACKOFF * 2 ** n секунд.
+SQLITE_LOCK_RETRIES = 5
+SQLITE_LOCK_BACKOFF = 0.05
@@ -0,0 +1,6 @@
+"""Настройки для запуска тестов."""
+from .settings import *  # noqa: F401,F403
+
+# Воркер из пула пишет в общую базу SQLite в памяти и блокирует
+# таблицы основному потоку теста.
+THUMBNAIL_WORKERS = 0
@@ -13,4 +13,14 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
-application = get_wsgi_application()
+django_application = get_wsgi_application()
+
+# Собранная статика отдаётся до Django, см. core.static.
+from core.static import StaticFiles  # noqa: E402
+
+application = StaticFiles(django_application)
+
+# Метаданные миниатюр свежих постов — в память до первого запроса.
+from posts.thumbnails import warm_thumbnails  # noqa: E402
+
+warm_thumbnails()